@@ -1,5 +1,10 @@
 import random
 
+import numpy as np
+
+from instrumentation import add_count, instrument
+from monte_carlo import MonteCarloResult, print_result, run_until_converged
+
 MAX_ITERATIONS = 100_000 # number of simulations
 ADJACENCY_DICTIONARY: dict[int, tuple[int, ...]] = {
     0: (1, 3, 4),
@@ -12,29 +17,82 @@ ADJACENCY_DICTIONARY: dict[int, tuple[int, ...]] = {
     7: (3, 4, 6)
 }
 STEPS = 7 # number of steps the ant takes
+# row v holds the neighbours of vertex v, so all ants can be moved with one lookup
+ADJACENCY_ARRAY = np.array([ADJACENCY_DICTIONARY[vertex] for vertex in range(8)])
 
-def main():
+@instrument
+def run_simulation(max_iterations: int = MAX_ITERATIONS, steps: int = STEPS) -> dict[int, int]:
+    '''runs the simulation and returns how many times the ant finished on each vertex'''
     frequencies: dict[int, int] = {}
     for vertex in range(8): # 8 vertices of a cube
         frequencies[vertex] = 0
 
-    for _ in range(MAX_ITERATIONS):
+    for _ in range(max_iterations):
         current_vertex = 0
-        for _ in range(STEPS):
+        for _ in range(steps):
             # finds all possible vertices to go to with ADJACENCY_DICTIONARY[current_vertex]
             # then selects random one with random.choice
             current_vertex = random.choice(ADJACENCY_DICTIONARY[current_vertex])
 
         frequencies[current_vertex] += 1
 
-        
+    add_count(run_simulation, 'trials', max_iterations)
+    return frequencies
+
+def simulate_batch(batch_size: int, rng: np.random.Generator, steps: int = STEPS) -> np.ndarray:
+    '''simulates batch_size ants at once and returns how many finished on each vertex'''
+    vertices = np.zeros(batch_size, dtype=np.int64)
+    for _ in range(steps):
+        # every ant picks one of the 3 neighbours of the vertex it is on
+        vertices = ADJACENCY_ARRAY[vertices, rng.integers(0, 3, batch_size)]
+
+    return np.bincount(vertices, minlength=8)
+
+def exact_distribution(steps: int = STEPS) -> np.ndarray:
+    '''exact probability of finishing on each vertex, from the transition matrix raised to the number of steps'''
+    transition = np.zeros((8, 8))
+    for vertex, neighbours in ADJACENCY_DICTIONARY.items():
+        transition[vertex, list(neighbours)] = 1 / len(neighbours)
+
+    start = np.zeros(8)
+    start[0] = 1
+    return start @ np.linalg.matrix_power(transition, steps)
+
+@instrument
+def run_converged_simulation(
+        half_width: float = 0.01,
+        confidence: float = 0.95,
+        steps: int = STEPS,
+        max_iterations: int = MAX_ITERATIONS,
+        seed: int | None = None,
+    ) -> MonteCarloResult:
+    '''runs ants in batches until every vertex probability is within half_width at the given confidence'''
+    result = run_until_converged(
+        lambda batch_size, rng: simulate_batch(batch_size, rng, steps),
+        half_width,
+        confidence,
+        max_trials=max_iterations,
+        rng=np.random.default_rng(seed),
+    )
+    add_count(run_converged_simulation, 'trials', result.trials)
+    return result
+
+def main():
+    frequencies = run_simulation()
+
     # frequencies.items() allows me to iterate over the dictionary
     # and assign number and frequency to all key value pairs.
     for number, frequency in frequencies.items():
         probability = frequency / MAX_ITERATIONS
         print (f'p({number}): {probability:.2%}')
 
+def main_converged():
+    # stops as soon as every probability is known to within 1% rather than after MAX_ITERATIONS
+    print ('\nRunning until converged:')
+    print_result(run_converged_simulation(), exact_distribution())
+
 
 if __name__ == '__main__':
 
-    main()
\ No newline at end of file
+    main()
+    main_converged()
\ No newline at end of file
@@ -9,33 +9,87 @@ Problem:
 
 import random
 
+import numpy as np
+
+from instrumentation import add_count, instrument
+from monte_carlo import MonteCarloResult, print_result, run_until_converged
+
 MAX_ITERATIONS = 100_000 # number of simulations
 SIDES = 5 # for a pentagon
 STEPS = 7 # number of steps the ant takes
 
-def main():
+@instrument
+def run_simulation(max_iterations: int = MAX_ITERATIONS, sides: int = SIDES, steps: int = STEPS) -> dict[int, int]:
+    '''runs the simulation and returns how many times Annie finished on each vertex'''
 
     # initializing frequency dictionary
     frequencies: dict[int, int] = {}
-    for vertex in range(SIDES):
+    for vertex in range(sides):
         frequencies[vertex] = 0
 
     # the _ is just used because I don't care about the value
-    for _ in range(MAX_ITERATIONS):
+    for _ in range(max_iterations):
         # this is where Annie starts
         current_vertex = 0
-        for _ in range(STEPS):
+        for _ in range(steps):
             # to add is 1 50% of the time and -1 the other 50%
             to_add = 1 if (random.randint(0, 1) == 1) else -1
             # adds this number to the current vertex
             current_vertex += to_add
 
-            # keeps this number in the set 0 to (SIDES - 1) or 4 if you left as pentagon
-            current_vertex %= SIDES
+            # keeps this number in the set 0 to (sides - 1) or 4 if you left as pentagon
+            current_vertex %= sides
 
         # this accesses the vertex number in the frequency dictionary and adds 1 to it
         frequencies[current_vertex] += 1
 
+    add_count(run_simulation, 'trials', max_iterations)
+    return frequencies
+
+def simulate_batch(batch_size: int, rng: np.random.Generator, sides: int = SIDES, steps: int = STEPS) -> np.ndarray:
+    '''simulates batch_size ants at once and returns how many finished on each vertex'''
+    # each row is one ant's steps, 1 or -1, so where she finishes is just the sum
+    moves = rng.integers(0, 2, size=(batch_size, steps)) * 2 - 1
+    vertices = moves.sum(axis=1) % sides
+
+    return np.bincount(vertices, minlength=sides)
+
+def exact_distribution(sides: int = SIDES, steps: int = STEPS) -> np.ndarray:
+    '''exact probability of finishing on each vertex, from the transition matrix raised to the number of steps'''
+    transition = np.zeros((sides, sides))
+    for vertex in range(sides):
+        # += so a 2 sided shape, where both moves go to the same vertex, still adds up to 1
+        transition[vertex, (vertex + 1) % sides] += 0.5
+        transition[vertex, (vertex - 1) % sides] += 0.5
+
+    start = np.zeros(sides)
+    start[0] = 1
+    return start @ np.linalg.matrix_power(transition, steps)
+
+@instrument
+def run_converged_simulation(
+        half_width: float = 0.01,
+        confidence: float = 0.95,
+        sides: int = SIDES,
+        steps: int = STEPS,
+        max_iterations: int = MAX_ITERATIONS,
+        seed: int | None = None,
+    ) -> MonteCarloResult:
+    '''runs ants in batches until every vertex probability is within half_width at the given confidence'''
+    result = run_until_converged(
+        lambda batch_size, rng: simulate_batch(batch_size, rng, sides, steps),
+        half_width,
+        confidence,
+        max_trials=max_iterations,
+        rng=np.random.default_rng(seed),
+    )
+    add_count(run_converged_simulation, 'trials', result.trials)
+    return result
+
+def main():
+
+    frequencies = run_simulation()
+
     # this formats the output nicely
     # frequencies.items() allows me to iterate over the dictionary
     # and assign number and frequency to all key value pairs.
@@ -43,6 +97,12 @@ def main():
         probability = frequency / MAX_ITERATIONS
         print (f'p({number}): {probability:.2%}')
 
+def main_converged():
+    # stops as soon as every probability is known to within 1% rather than after MAX_ITERATIONS
+    print ('\nRunning until converged:')
+    print_result(run_converged_simulation(), exact_distribution())
+
 # Having code inside a main function is good practice
 if __name__ == '__main__':
     main()
+    main_converged()
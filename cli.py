@@ -0,0 +1,463 @@
+'''
+Single command line entry point for the simulations and solvers in this repo.
+
+Every subcommand takes its parameters either from flags or from an input file
+(.json, .jsonl or .csv, one parameter set per object / row), runs once per
+parameter set and streams the results out as JSON lines, CSV or Parquet.
+
+Examples:
+    python cli.py amortize --principal 512 --annual-interest-rate 0.85 --number-of-payments 24
+    python cli.py rooks --num-rooks 8 --num-simulations 10000 --seed 1 --format csv
+    python cli.py ant --input sweep.jsonl --format parquet --output ant.parquet
+    python cli.py ant --half-width 0.01 --seed 1
+    python cli.py integrate --function "math.sin(x)" --a 0 --b 3.14159 --n 100
+'''
+
+import argparse
+import ast
+import csv
+import json
+import math
+import random
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+import numpy as np
+
+import instrumentation
+
+
+# a single parameter that a subcommand accepts, used to build the flags
+# and to convert values read from an input file to the right type
+@dataclass
+class Parameter:
+    name: str
+    type: Callable[[Any], Any]
+    default: Any
+    help: str = ''
+    # the only values allowed, for parameters that pick between named options
+    choices: tuple[str, ...] | None = None
+
+
+@dataclass
+class Command:
+    name: str
+    help: str
+    parameters: list[Parameter]
+    run: Callable[[dict[str, Any]], Iterator[dict[str, Any]]]
+    # modules the command's results depend on, used to version cached results
+    modules: tuple[str, ...] = ()
+
+
+def seed_everything(seed: int | None) -> None:
+    '''seeds both random number generators used across the repo'''
+    if seed is None:
+        return
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def run_amortize(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    from loan_project import get_repayments_dataframe
+
+    df = get_repayments_dataframe(
+        params['principal'],
+        params['annual_interest_rate'] / 12,
+        params['number_of_payments']
+    )
+    for row in df.to_dict(orient='records'):
+        yield {'month': int(row['month']), **{key: float(value) for key, value in row.items() if key != 'month'}}
+
+
+def run_apr(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    from loan_project import calculate_apr_bisection, calculate_apr_newton
+
+    methods = {
+        'newton': calculate_apr_newton,
+        'bisection': calculate_apr_bisection,
+    }
+    names = list(methods) if params['method'] == 'both' else [params['method']]
+
+    for name in names:
+        generator = methods[name](
+            params['principal'],
+            params['monthly_payment'],
+            params['number_of_payments']
+        )
+        for iteration in range(1, params['iterations'] + 1):
+            yield {'method': name, 'iteration': iteration, 'apr': next(generator)}
+
+
+def run_rooks(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    import rook_simulation
+
+    seed_everything(params['seed'])
+    challenges = rook_simulation.run_simulation(params['num_rooks'], params['num_simulations'], params['board_size'])
+    yield {'challenges': challenges, 'probability': challenges / params['num_simulations']}
+
+
+def run_pieces(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    import piece_simulation
+
+    if params['method'] == 'exact':
+        probability = piece_simulation.exact_probability(params['piece'], params['num_pieces'], params['board_size'])
+        yield {'challenges': None, 'probability': probability}
+        return
+    if params['method'] != 'monte_carlo':
+        raise ValueError(f"Unknown method '{params['method']}', expected 'monte_carlo' or 'exact'.")
+
+    seed_everything(params['seed'])
+    challenges = piece_simulation.run_simulation(
+        params['piece'],
+        params['num_pieces'],
+        params['num_simulations'],
+        params['board_size']
+    )
+    yield {'challenges': challenges, 'probability': challenges / params['num_simulations']}
+
+
+def run_ant(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    import ant_3d
+    import ant_original
+
+    from monte_carlo import simultaneous_z_score, wilson_interval
+
+    if params['shape'] == 'cube':
+        exact = ant_3d.exact_distribution(params['steps'])
+    elif params['shape'] == 'polygon':
+        exact = ant_original.exact_distribution(params['sides'], params['steps'])
+    else:
+        raise ValueError(f"Unknown shape '{params['shape']}', expected 'cube' or 'polygon'.")
+    if params['max_iterations'] < 1:
+        raise ValueError(f"max_iterations must be at least 1, got {params['max_iterations']}.")
+
+    if params['half_width'] is not None:
+        # batches of ants until every probability is within half_width, up to max_iterations
+        if params['shape'] == 'cube':
+            result = ant_3d.run_converged_simulation(
+                params['half_width'], params['confidence'], params['steps'], params['max_iterations'], params['seed']
+            )
+        else:
+            result = ant_original.run_converged_simulation(
+                params['half_width'], params['confidence'], params['sides'], params['steps'], params['max_iterations'], params['seed']
+            )
+        trials, counts, lower, upper = result.trials, result.counts, result.lower, result.upper
+        # converged is False when max_iterations ran out before every interval was within half_width
+        converged = result.converged
+        tv_distance = result.tv_distances[-1] if result.tv_distances else None
+    else:
+        seed_everything(params['seed'])
+        if params['shape'] == 'cube':
+            frequencies = ant_3d.run_simulation(params['max_iterations'], params['steps'])
+        else:
+            frequencies = ant_original.run_simulation(params['max_iterations'], params['sides'], params['steps'])
+        trials = params['max_iterations']
+        counts = np.array(list(frequencies.values()))
+        lower, upper = wilson_interval(counts, trials, simultaneous_z_score(params['confidence'], len(counts)))
+        # a fixed number of trials has no half_width to reach
+        converged = tv_distance = None
+
+    for vertex, frequency in enumerate(counts.tolist()):
+        yield {
+            'vertex': vertex,
+            'trials': trials,
+            'frequency': frequency,
+            'probability': frequency / trials,
+            'lower': float(lower[vertex]),
+            'upper': float(upper[vertex]),
+            'exact': float(exact[vertex]),
+            'converged': converged,
+            'tv_distance': tv_distance,
+        }
+
+
+def run_walk(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    # importing random_walk builds the Dash app, so only do it when needed
+    from random_walk import generate_random_walk
+
+    seed_everything(params['seed'])
+    walks = generate_random_walk(params['steps'], params['walkers'], params['bias'], params['dimensions'])
+    for walker, walk in enumerate(walks):
+        for step, position in enumerate(walk):
+            # always emit x, y and z so every row has the same columns
+            x, y, z = (list(position) + [None, None])[:3]
+            yield {'walker': walker, 'step': step, 'x': x, 'y': y, 'z': z}
+
+
+MATH_NAMES = {name: value for name, value in vars(math).items() if not name.startswith('_')}
+ALLOWED_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub)
+
+
+def check_expression(node: ast.AST) -> None:
+    '''
+    raises ValueError unless node only uses numbers, x, arithmetic and the math module,
+    input files come from pipelines so the expression must never be able to run other code
+    '''
+    if isinstance(node, ast.Expression):
+        check_expression(node.body)
+    elif isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ValueError(f'Only numbers are allowed as constants, got {node.value!r}.')
+    elif isinstance(node, ast.Name):
+        if node.id != 'x' and node.id not in MATH_NAMES:
+            raise ValueError(f"Unknown name '{node.id}', only x and math functions are allowed.")
+    elif isinstance(node, ast.Attribute):
+        if not (isinstance(node.value, ast.Name) and node.value.id == 'math' and node.attr in MATH_NAMES):
+            raise ValueError('Only math.<name> attributes are allowed.')
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ALLOWED_OPERATORS):
+        check_expression(node.left)
+        check_expression(node.right)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ALLOWED_OPERATORS):
+        check_expression(node.operand)
+    elif isinstance(node, ast.Call) and not node.keywords:
+        if not isinstance(node.func, (ast.Name, ast.Attribute)) or getattr(node.func, 'id', None) == 'x':
+            raise ValueError('Only math functions can be called.')
+        check_expression(node.func)
+        for argument in node.args:
+            check_expression(argument)
+    else:
+        raise ValueError(f'{type(node).__name__} is not allowed in a function expression.')
+
+
+def parse_expression(expression: str) -> ast.Expression:
+    '''
+    parses and checks an expression in x, with every number turned into a float
+
+    x is always a float, so with float constants nothing can build huge integers:
+    9 ** 9 ** 9 ** 9 overflows straight away instead of running for ever
+    '''
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as error:
+        raise ValueError(f"Could not parse function '{expression}': {error.msg}") from None
+    check_expression(tree)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant):
+            try:
+                node.value = float(node.value)
+            except OverflowError:
+                raise ValueError(f'The number {node.value} is too big.') from None
+    return tree
+
+
+def math_expression(expression: str) -> str:
+    '''checks that expression is an arithmetic expression in x, used as the parameter type'''
+    parse_expression(expression)
+    return expression
+
+
+def compile_function(expression: str) -> Callable[[float], float]:
+    '''turns an expression in x such as "x ** 2" or "math.exp(-x)" into a function'''
+    code = compile(parse_expression(expression), '<function>', 'eval')
+    namespace = {'__builtins__': {}, 'math': math, **MATH_NAMES}
+    return lambda x: eval(code, namespace, {'x': x})
+
+
+def run_integrate(params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    from simpsons_rule import simpsons_rule
+
+    f = compile_function(params['function'])
+    try:
+        value = simpsons_rule(f, params['n'], params['a'], params['b'])
+    except ArithmeticError as error:
+        # e.g. dividing by zero or a result too big for a float
+        raise ValueError(f"Could not integrate '{params['function']}': {error}") from None
+    yield {'value': value}
+
+
+def optional_int(value: Any) -> int | None:
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def optional_float(value: Any) -> float | None:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+COMMANDS: dict[str, Command] = {
+    command.name: command for command in [
+        Command('amortize', 'repayment schedule for a loan', [
+            Parameter('principal', float, 512, 'amount borrowed'),
+            Parameter('annual_interest_rate', float, 0.85, 'as a fraction, e.g. 0.1 for 10%'),
+            Parameter('number_of_payments', int, 24, 'number of monthly payments'),
+        ], run_amortize, ('loan_project',)),
+        Command('apr', 'APR estimates from Newton\'s method and/or bisection', [
+            Parameter('principal', float, 512, 'amount borrowed'),
+            Parameter('monthly_payment', float, 44.96781634956033, 'monthly repayment'),
+            Parameter('number_of_payments', int, 24, 'number of monthly payments'),
+            Parameter('method', str, 'both', 'newton, bisection or both', ('newton', 'bisection', 'both')),
+            Parameter('iterations', int, 10, 'number of estimates to output per method'),
+        ], run_apr, ('loan_project',)),
+        Command('rooks', 'probability that randomly placed rooks challenge each other', [
+            Parameter('num_rooks', int, 8, 'rooks placed on the board'),
+            Parameter('num_simulations', int, 10_000, 'number of trials'),
+            Parameter('board_size', int, 8, 'the board is board_size x board_size'),
+            Parameter('seed', optional_int, None, 'random seed'),
+        ], run_rooks, ('rook_simulation', 'piece_simulation')),
+        Command('pieces', 'probability that randomly placed rooks, bishops, queens or knights challenge each other', [
+            Parameter('piece', str, 'queen', 'rook, bishop, queen or knight', ('rook', 'bishop', 'queen', 'knight')),
+            Parameter('num_pieces', int, 2, 'pieces placed on the board'),
+            Parameter('board_size', int, 8, 'the board is board_size x board_size, up to 64'),
+            Parameter('method', str, 'monte_carlo', 'monte_carlo or exact', ('monte_carlo', 'exact')),
+            Parameter('num_simulations', int, 10_000, 'number of trials for monte_carlo'),
+            Parameter('seed', optional_int, None, 'random seed'),
+        ], run_pieces, ('piece_simulation',)),
+        Command('ant', 'where the ant finishes on a cube or polygon', [
+            Parameter('shape', str, 'cube', 'cube or polygon', ('cube', 'polygon')),
+            Parameter('sides', int, 5, 'number of sides when shape is polygon'),
+            Parameter('steps', int, 7, 'number of steps the ant takes'),
+            Parameter('max_iterations', int, 100_000, 'number of simulations, the most used when half_width is set'),
+            Parameter('half_width', optional_float, None, 'stop once every probability is within this, e.g. 0.01'),
+            Parameter('confidence', float, 0.95, 'confidence that every interval holds at once'),
+            Parameter('seed', optional_int, None, 'random seed'),
+        ], run_ant, ('ant_3d', 'ant_original', 'monte_carlo')),
+        Command('walk', 'positions of biased random walkers', [
+            Parameter('steps', int, 100, 'number of steps'),
+            Parameter('walkers', int, 1, 'number of walkers'),
+            Parameter('bias', float, 0.5, 'probability of stepping +1'),
+            Parameter('dimensions', int, 2, '1, 2 or 3'),
+            Parameter('seed', optional_int, None, 'random seed'),
+        ], run_walk, ('random_walk',)),
+        Command('integrate', 'Simpson\'s rule integral of f(x) between a and b', [
+            Parameter('function', math_expression, 'x ** 2', 'arithmetic expression in x, math functions are available'),
+            Parameter('n', int, 10, 'number of intervals'),
+            Parameter('a', float, 0.0, 'lower limit'),
+            Parameter('b', float, 1.0, 'upper limit'),
+        ], run_integrate, ('simpsons_rule',)),
+    ]
+}
+
+
+def read_parameter_sets(path: str) -> list[dict[str, Any]]:
+    '''reads parameter sets from a .json, .jsonl or .csv file'''
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            return [dict(row) for row in csv.DictReader(file)]
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in file if line.strip()]
+
+        data = json.load(file)
+        return data if isinstance(data, list) else [data]
+
+
+def resolve_parameters(command: Command, defaults: dict[str, Any], overrides: dict[str, Any]) -> dict[str, Any]:
+    '''merges a parameter set from a file over the flag values, converting types'''
+    unknown = set(overrides) - {parameter.name for parameter in command.parameters}
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) for {command.name}: {', '.join(sorted(unknown))}")
+
+    params: dict[str, Any] = {}
+    for parameter in command.parameters:
+        value = overrides.get(parameter.name, defaults[parameter.name])
+        params[parameter.name] = value if value is None else parameter.type(value)
+        if parameter.choices is not None and params[parameter.name] not in parameter.choices:
+            raise ValueError(
+                f"Invalid {parameter.name} '{params[parameter.name]}' for {command.name}, "
+                f"expected one of {', '.join(parameter.choices)}."
+            )
+    return params
+
+
+def run_command(command: Command, parameter_sets: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    '''runs the command once per parameter set, tagging each result row with its parameters'''
+    for params in parameter_sets:
+        for row in command.run(params):
+            yield {**params, **row}
+
+
+def write_jsonl(rows: Iterable[dict[str, Any]], file: TextIO) -> None:
+    for row in rows:
+        file.write(json.dumps(row) + '\n')
+        file.flush()
+
+
+def write_csv(rows: Iterable[dict[str, Any]], file: TextIO) -> None:
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(file, fieldnames=list(row), lineterminator='\n')
+            writer.writeheader()
+        writer.writerow(row)
+        file.flush()
+
+
+def write_parquet(rows: Iterable[dict[str, Any]], path: str) -> None:
+    # parquet is columnar, so the rows have to be collected before writing
+    import pandas as pd
+
+    pd.DataFrame(list(rows)).to_parquet(path, index=False)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Run the simulations and solvers in this repo.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for command in COMMANDS.values():
+        subparser = subparsers.add_parser(command.name, help=command.help)
+        for parameter in command.parameters:
+            subparser.add_argument(
+                '--' + parameter.name.replace('_', '-'),
+                dest=parameter.name,
+                type=parameter.type,
+                choices=parameter.choices,
+                default=parameter.default,
+                help=f'{parameter.help} (default: {parameter.default})'
+            )
+        subparser.add_argument('--input', help='.json, .jsonl or .csv file of parameter sets, values override the flags')
+        subparser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], default='jsonl')
+        subparser.add_argument('--output', help='file to write to (default: stdout, not available for parquet)')
+        subparser.add_argument('--instrument', metavar='FILE',
+                               help='record timings and counts, written as Prometheus text if FILE ends in .prom, otherwise JSON lines')
+        subparser.add_argument('--instrument-memory', action='store_true', help='also record memory high-water marks (slower)')
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    command = COMMANDS[args.command]
+
+    defaults = {parameter.name: getattr(args, parameter.name) for parameter in command.parameters}
+    overrides = read_parameter_sets(args.input) if args.input else [{}]
+    try:
+        parameter_sets = [resolve_parameters(command, defaults, override) for override in overrides]
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.format == 'parquet' and args.output is None:
+        parser.error('--output is required for parquet')
+
+    if args.instrument:
+        instrumentation.enable(memory=args.instrument_memory)
+    try:
+        write_rows(run_command(command, parameter_sets), args.format, args.output)
+    except ValueError as error:
+        # bad combinations of parameters, e.g. more pieces than squares, are only found when running
+        parser.error(str(error))
+    finally:
+        if args.instrument:
+            instrumentation.export(args.instrument)
+
+
+def write_rows(rows: Iterable[dict[str, Any]], format: str, output: str | None) -> None:
+    '''writes rows in the given format to output, or to stdout if output is None'''
+    if format == 'parquet':
+        write_parquet(rows, output)
+        return
+
+    writer = write_jsonl if format == 'jsonl' else write_csv
+    if output is None:
+        writer(rows, sys.stdout)
+    else:
+        with open(output, 'w', newline='') as file:
+            writer(rows, file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+'''
+Opt-in instrumentation for the solvers and simulations.
+
+Public entry points are wrapped with @instrument, which records call counts and
+wall time, and code can add its own counters (function evaluations, trials)
+with add_count or counted. Memory high-water marks are recorded with tracemalloc
+when enabled with memory=True, since tracing slows everything else down.
+
+tracemalloc has a single peak for the whole process, so memory is only measured
+on the thread that turned it on, and calls on other threads (e.g. the random walk
+renderer's pool) record time and counts but no memory. Allocations made by other
+threads while a measured call is running are still included in its peak.
+
+Everything is off by default and the wrappers then cost a single flag check.
+Turn it on with enable(), the enabled() context manager, cli.py or sweep.py
+--instrument, or by setting MATHSCODE_INSTRUMENT to a file path, in which case
+the metrics are written there when the process exits.
+
+Worker processes keep their own metrics, so a pool should be started with
+init_worker and each worker's snapshot() passed back and merged into the parent.
+
+Metrics are exported as JSON lines (one object per entry point) or, for paths
+ending in .prom, in the Prometheus text format.
+'''
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, TypeVar
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_enabled = False
+_track_memory = False
+# whether enable() started tracemalloc, so disable() leaves it running if someone else did
+_started_tracemalloc = False
+_memory_thread: int | None = None
+_export_path: str | None = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+@dataclass
+class Metric:
+    calls: int = 0
+    seconds_total: float = 0.0
+    seconds_max: float = 0.0
+    # None until a call has been measured with memory tracking on
+    memory_peak_bytes: int | None = None
+    counters: dict[str, int] = field(default_factory=dict)
+
+
+METRICS: dict[str, Metric] = {}
+
+# fields of a snapshot() row that aren't counters
+_STANDARD_FIELDS = {'name', 'calls', 'seconds_total', 'seconds_max', 'memory_peak_bytes', 'trials_per_second'}
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def is_tracking_memory() -> bool:
+    return _track_memory
+
+
+def _set_memory_tracking(memory: bool) -> None:
+    global _track_memory, _started_tracemalloc, _memory_thread
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    elif not memory and _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _track_memory = memory
+    _memory_thread = threading.get_ident() if memory else None
+
+
+def enable(memory: bool = False) -> None:
+    '''turns instrumentation on, memory=True also records tracemalloc high-water marks on this thread'''
+    global _enabled
+    _enabled = True
+    _set_memory_tracking(memory)
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+    _set_memory_tracking(False)
+
+
+def reset() -> None:
+    with _lock:
+        METRICS.clear()
+
+
+def init_worker(enabled: bool, memory: bool = False) -> None:
+    '''initializer for pool worker processes, which report through snapshot() rather than exporting themselves'''
+    global _export_path
+    # forked workers start with a copy of the parent's metrics and settings
+    _export_path = None
+    reset()
+    if enabled:
+        enable(memory)
+    else:
+        disable()
+
+
+@contextmanager
+def enabled(memory: bool = False) -> Iterator[dict[str, Metric]]:
+    '''turns instrumentation on for the duration of the block and yields the metrics'''
+    was_enabled, was_tracking_memory = _enabled, _track_memory
+    enable(memory)
+    try:
+        yield METRICS
+    finally:
+        if was_enabled:
+            enable(was_tracking_memory)
+        else:
+            disable()
+
+
+def name_of(entry_point: Callable[..., Any] | str) -> str:
+    if isinstance(entry_point, str):
+        return entry_point
+    return f'{entry_point.__module__}.{entry_point.__qualname__}'
+
+
+def _metric(name: str) -> Metric:
+    metric = METRICS.get(name)
+    if metric is None:
+        metric = METRICS.setdefault(name, Metric())
+    return metric
+
+
+def add_count(entry_point: Callable[..., Any] | str, counter: str, amount: int = 1) -> None:
+    '''adds to a named counter (e.g. "evaluations" or "trials") of an entry point'''
+    if not _enabled:
+        return
+    with _lock:
+        counters = _metric(name_of(entry_point)).counters
+        counters[counter] = counters.get(counter, 0) + amount
+
+
+def counted(entry_point: Callable[..., Any] | str, func: F, counter: str = 'evaluations') -> F:
+    '''wraps func so every call adds one to the counter, returns func unchanged when disabled'''
+    if not _enabled:
+        return func
+    name = name_of(entry_point)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        add_count(name, counter)
+        return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+# memory high-water marks of nested measurements: tracemalloc only has one peak,
+# so each frame remembers the highest peak seen before an inner frame reset it
+def _memory_frames() -> list[list[int]]:
+    frames = getattr(_local, 'memory_frames', None)
+    if frames is None:
+        frames = _local.memory_frames = []
+    return frames
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    '''records one call of name with its wall time (and memory high-water mark if enabled)'''
+    if not _enabled:
+        yield
+        return
+
+    frames = None
+    if _track_memory and _memory_thread == threading.get_ident() and tracemalloc.is_tracing():
+        frames = _memory_frames()
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            frames[-1][1] = max(frames[-1][1], peak)
+        # [memory at the start, highest peak seen inside this frame]
+        frames.append([current, current])
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+
+        memory_peak = None
+        if frames:
+            start_memory, highest = frames.pop()
+            peak = max(highest, tracemalloc.get_traced_memory()[1])
+            memory_peak = peak - start_memory
+            if frames:
+                frames[-1][1] = max(frames[-1][1], peak)
+            tracemalloc.reset_peak()
+
+        with _lock:
+            metric = _metric(name)
+            metric.calls += 1
+            metric.seconds_total += elapsed
+            metric.seconds_max = max(metric.seconds_max, elapsed)
+            if memory_peak is not None:
+                metric.memory_peak_bytes = max(metric.memory_peak_bytes or 0, memory_peak)
+
+
+def instrument(func: F) -> F:
+    '''decorator recording calls and wall time of a public entry point under module.function
+
+    for generator functions the time spent producing every value is recorded and
+    each value produced counts as an "iterations" count.
+    '''
+    name = name_of(func)
+
+    if inspect.isgeneratorfunction(func):
+        def measured_generator(args, kwargs):
+            generator = func(*args, **kwargs)
+            while True:
+                with measure(name):
+                    try:
+                        value = next(generator)
+                    except StopIteration:
+                        return
+                add_count(name, 'iterations')
+                yield value
+
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            return measured_generator(args, kwargs)
+
+        return generator_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with measure(name):
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def snapshot() -> list[dict[str, Any]]:
+    '''returns the metrics as a list of plain dictionaries, one per entry point'''
+    rows = []
+    with _lock:
+        for name, metric in sorted(METRICS.items()):
+            row = {
+                'name': name,
+                'calls': metric.calls,
+                'seconds_total': metric.seconds_total,
+                'seconds_max': metric.seconds_max,
+            }
+            # without tracemalloc the peak is never measured, so leave it out rather than report 0
+            if metric.memory_peak_bytes is not None:
+                row['memory_peak_bytes'] = metric.memory_peak_bytes
+            row.update(metric.counters)
+            if 'trials' in metric.counters and metric.seconds_total > 0:
+                row['trials_per_second'] = metric.counters['trials'] / metric.seconds_total
+            rows.append(row)
+    return rows
+
+
+def merge(rows: list[dict[str, Any]]) -> None:
+    '''adds the rows of a snapshot() taken in another process, e.g. a sweep worker, to these metrics'''
+    if not _enabled:
+        return
+    with _lock:
+        for row in rows:
+            metric = _metric(row['name'])
+            metric.calls += row['calls']
+            metric.seconds_total += row['seconds_total']
+            metric.seconds_max = max(metric.seconds_max, row['seconds_max'])
+            if 'memory_peak_bytes' in row:
+                metric.memory_peak_bytes = max(metric.memory_peak_bytes or 0, row['memory_peak_bytes'])
+            for counter, amount in row.items():
+                if counter not in _STANDARD_FIELDS:
+                    metric.counters[counter] = metric.counters.get(counter, 0) + amount
+
+
+def to_prometheus() -> str:
+    '''formats the metrics in the Prometheus text exposition format'''
+    lines: list[str] = []
+    rows = snapshot()
+
+    def family(metric: str, kind: str, help_text: str, key: str) -> None:
+        if not any(key in row for row in rows):
+            return
+        lines.append(f'# HELP mathscode_{metric} {help_text}')
+        lines.append(f'# TYPE mathscode_{metric} {kind}')
+        for row in rows:
+            if key in row:
+                lines.append(f'mathscode_{metric}{{function="{row["name"]}"}} {row[key]}')
+
+    family('calls_total', 'counter', 'Number of calls.', 'calls')
+    family('seconds_total', 'counter', 'Total wall time in seconds.', 'seconds_total')
+    family('seconds_max', 'gauge', 'Longest single call in seconds.', 'seconds_max')
+    family('memory_peak_bytes', 'gauge', 'Highest traced memory allocated during a call.', 'memory_peak_bytes')
+
+    for counter in sorted({key for row in rows for key in row} - _STANDARD_FIELDS):
+        family(f'{counter}_total', 'counter', f'Number of {counter}.', counter)
+    family('trials_per_second', 'gauge', 'Trials per second of wall time.', 'trials_per_second')
+
+    return '\n'.join(lines) + '\n'
+
+
+def export(path: str) -> None:
+    '''writes the metrics to path, in the Prometheus text format if it ends in .prom, otherwise as JSON lines'''
+    with open(path, 'w') as file:
+        if path.endswith('.prom'):
+            file.write(to_prometheus())
+        else:
+            for row in snapshot():
+                file.write(json.dumps(row) + '\n')
+
+
+def _export_at_exit() -> None:
+    if _export_path is not None:
+        export(_export_path)
+
+
+if os.environ.get('MATHSCODE_INSTRUMENT'):
+    enable(memory=os.environ.get('MATHSCODE_INSTRUMENT_MEMORY') == '1')
+    _export_path = os.environ['MATHSCODE_INSTRUMENT']
+    atexit.register(_export_at_exit)
@@ -0,0 +1,191 @@
+'''
+Compares any number of loans with different principals, APRs and terms.
+
+All schedules are worked out in one vectorised pass as (loans x months) arrays,
+using the closed form for the balance after t payments:
+
+    balance_t = P(1 + r)^t - M((1 + r)^t - 1) / r
+
+instead of stepping through the months one loan at a time. Months after a loan
+has been paid off are zero.
+
+Loans use the same dictionaries as loan_project_extension:
+    {'Principal': 1000, 'APR': 10, 'Months': 12}   (APR in percent)
+
+compare_loans gives one summary row per loan and cash_flows the month by month
+cash flows in long format, one row per loan and month.
+'''
+
+import time
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrument
+from loan_project import calculate_monthly_payment
+
+
+def monthly_payments(principals: np.ndarray, monthly_interest_rates: np.ndarray, months: np.ndarray) -> np.ndarray:
+    '''calculate_monthly_payment for arrays of loans, interest free loans are just split evenly'''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payments = calculate_monthly_payment(principals, monthly_interest_rates, months)
+    return np.where(monthly_interest_rates == 0, principals / months, payments)
+
+
+def loans_to_arrays(loans: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if not loans:
+        raise ValueError('There must be at least one loan to compare.')
+    principals = np.array([loan['Principal'] for loan in loans], dtype=float)
+    aprs = np.array([loan['APR'] for loan in loans], dtype=float)
+    months = np.array([loan['Months'] for loan in loans], dtype=int)
+    if (months < 1).any():
+        loan = int(np.argmax(months < 1)) + 1
+        raise ValueError(f"Loan {loan} has {months[loan - 1]} months, every loan needs at least 1.")
+    return principals, aprs, months
+
+
+@instrument
+def loan_schedules(principals: np.ndarray, aprs: np.ndarray, months: np.ndarray) -> dict[str, np.ndarray]:
+    '''
+    returns (loans x months) arrays of the payment, interest paid, principal paid and
+    remaining balance for every month, plus the monthly payment of each loan
+    '''
+    principals = np.asarray(principals, dtype=float)
+    monthly_interest_rates = np.asarray(aprs, dtype=float) / 100 / 12
+    months = np.asarray(months, dtype=int)
+    payment = monthly_payments(principals, monthly_interest_rates, months)
+
+    # column t is the state after t + 1 payments
+    t = np.arange(1, months.max() + 1)
+    active = t[None, :] <= months[:, None]
+
+    # rearranging the closed form as (P - M / r)(1 + r)^t + M / r leaves a single
+    # multiply and add over the whole (loans x months) array
+    interest_free = monthly_interest_rates == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(interest_free, 0.0, payment / monthly_interest_rates)
+    previous_balance = (1 + monthly_interest_rates[:, None]) ** (t - 1)
+    previous_balance *= (principals - annuity)[:, None]
+    previous_balance += annuity[:, None]
+    if interest_free.any():
+        previous_balance[interest_free] = principals[interest_free, None] - payment[interest_free, None] * (t - 1)
+    previous_balance[~active] = 0.0
+
+    interest = previous_balance * monthly_interest_rates[:, None]
+    payments = active * payment[:, None]
+    principal_paid = payments - interest
+    balance = np.maximum(previous_balance - principal_paid, 0.0)
+
+    return {
+        'monthly_payment': payment,
+        'payment': payments,
+        'interest_paid': interest,
+        'principal_paid': principal_paid,
+        'remaining': balance,
+    }
+
+
+def cumulative_cash_flows(principals: np.ndarray, payments: np.ndarray) -> np.ndarray:
+    '''what the lender has received minus the principal, as a (loans x months) array'''
+    return np.cumsum(payments, axis=1) - principals[:, None]
+
+
+@instrument
+def compare_loans(loans: list[dict[str, Any]], annual_discount_rate: float = 0.0) -> pd.DataFrame:
+    '''
+    returns one row per loan with:
+    - monthly_payment, total_paid and total_interest
+    - break_even_month: the first month the payments add up to the principal
+    - npv: present value of the payments at annual_discount_rate minus the principal,
+      i.e. the cost of the loan in today's money (equal to total_interest at a 0% rate)
+
+    the month by month cash flows are given by cash_flows
+    '''
+    principals, aprs, months = loans_to_arrays(loans)
+    schedules = loan_schedules(principals, aprs, months)
+    payments = schedules['payment']
+
+    cumulative_cash_flow = cumulative_cash_flows(principals, payments)
+    # rounding errors can leave the last month a tiny fraction of a penny short
+    repaid = cumulative_cash_flow >= -1e-9 * principals[:, None]
+    break_even_month = np.where(repaid.any(axis=1), repaid.argmax(axis=1) + 1, -1)
+
+    t = np.arange(1, payments.shape[1] + 1)
+    discount_factors = (1 + annual_discount_rate / 12) ** -t
+    npv = payments @ discount_factors - principals
+
+    return pd.DataFrame({
+        'loan': np.arange(1, len(loans) + 1),
+        'principal': principals,
+        'apr': aprs,
+        'months': months,
+        'monthly_payment': schedules['monthly_payment'],
+        'total_paid': payments.sum(axis=1),
+        'total_interest': schedules['interest_paid'].sum(axis=1),
+        'break_even_month': break_even_month,
+        'npv': npv,
+    })
+
+
+@instrument
+def cash_flows(loans: list[dict[str, Any]]) -> pd.DataFrame:
+    '''
+    returns one row per loan and month of its term with the payment received that
+    month and the cumulative_cash_flow, what the lender has received minus the principal
+    '''
+    principals, aprs, months = loans_to_arrays(loans)
+    payments = loan_schedules(principals, aprs, months)['payment']
+    cumulative_cash_flow = cumulative_cash_flows(principals, payments)
+
+    # months after a loan is paid off are left out rather than repeated
+    active = np.arange(1, payments.shape[1] + 1)[None, :] <= months[:, None]
+    loan, month = np.nonzero(active)
+    return pd.DataFrame({
+        'loan': loan + 1,
+        'month': month + 1,
+        'cash_flow': payments[active],
+        'cumulative_cash_flow': cumulative_cash_flow[active],
+    })
+
+
+def random_loans(num_loans: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    return [
+        {'Principal': principal, 'APR': apr, 'Months': months}
+        for principal, apr, months in zip(
+            rng.uniform(1_000, 300_000, num_loans).round(2),
+            rng.uniform(1, 30, num_loans).round(2),
+            rng.choice([12, 24, 36, 60, 120, 240, 360], num_loans),
+        )
+    ]
+
+
+def best_time(func, repeats: int = 3) -> float:
+    '''fastest of several runs, the first run also pays for the operating system handing over fresh memory'''
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(num_loans: int = 10_000):
+    '''times comparing num_loans loans in one pass against working out each balance one loan at a time'''
+    # imported here because loan_project_extension needs tkinter
+    from loan_project_extension import calculate_loan_values
+
+    loans = random_loans(num_loans)
+
+    vectorised_seconds = best_time(lambda: compare_loans(loans, annual_discount_rate=0.05))
+    loop_seconds = best_time(lambda: [calculate_loan_values(loan) for loan in loans])
+
+    # test_loan_comparison.py checks both approaches agree on every balance
+    print (f'compared {num_loans} loans in {vectorised_seconds:.3f}s ({num_loans / vectorised_seconds:,.0f} loans/s)')
+    print (f'one loan at a time, balances only (less work than compare_loans): {loop_seconds:.3f}s')
+    print (compare_loans(loans[:5], annual_discount_rate=0.05))
+
+
+if __name__ == '__main__':
+    benchmark()
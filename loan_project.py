@@ -4,10 +4,13 @@ import numpy as np
 import matplotlib.pyplot as plt
 from typing import Callable, Generator, Any, Iterator
 
+from instrumentation import counted, instrument
+
 def calculate_monthly_payment(principal: float, monthly_interest_rate: float, number_of_payments: int) -> float:
     
     return ( principal * monthly_interest_rate ) / ( 1 - (1 + monthly_interest_rate) ** (-number_of_payments) )
 
+@instrument
 def get_repayments_dataframe(principal: float, monthly_interest_rate: float, number_of_payments: int) -> pd.DataFrame:
 
     monthly_payment = calculate_monthly_payment(principal, monthly_interest_rate, number_of_payments)
@@ -62,6 +65,7 @@ def draw_interest_principal_chart(principal: float, monthly_interest_rate: float
 def newtons_method(x: float, func: Callable[[float], float], deriv: Callable[[float], float]) -> float:
     return x - ( func(x) / deriv(x) )
 
+@instrument
 def calculate_apr_newton(
         principal: float,
         monthly_payment: float,
@@ -69,8 +73,8 @@ def calculate_apr_newton(
         start_apr: float = 0.5,
     ) -> Generator[float, None, None]:
 
-    func = lambda x: 12 * monthly_payment - principal * x - 12 * monthly_payment * (1 + (1/12) * x) ** (- number_of_payments)
-    deriv = lambda x: monthly_payment * (1 + 1/12 * x) ** (-number_of_payments - 1) - principal
+    func = counted(calculate_apr_newton, lambda x: 12 * monthly_payment - principal * x - 12 * monthly_payment * (1 + (1/12) * x) ** (- number_of_payments))
+    deriv = counted(calculate_apr_newton, lambda x: monthly_payment * (1 + 1/12 * x) ** (-number_of_payments - 1) - principal)
     
     apr = start_apr
     fx = 1.0 # test value
@@ -86,6 +90,7 @@ def calculate_apr_newton(
 def sign_is_different(x: float, y: float) -> bool:
     return (x > 0) ^ (y > 0)
 
+@instrument
 def calculate_apr_bisection(
         principal: float,
         monthly_payment: float,
@@ -94,7 +99,7 @@ def calculate_apr_bisection(
         start_b: float = 1
     ) -> Generator[float, None, None]:
 
-    func = lambda x: 12 * monthly_payment - principal * x - 12 * monthly_payment * (1 + (1/12) * x) ** (- number_of_payments)
+    func = counted(calculate_apr_bisection, lambda x: 12 * monthly_payment - principal * x - 12 * monthly_payment * (1 + (1/12) * x) ** (- number_of_payments))
 
     a, b = start_a, start_b
 
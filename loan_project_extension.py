@@ -4,11 +4,12 @@ import numpy as np
 from typing import Any
 import matplotlib.pyplot as plt
 
-
-def calculate_monthly_payment(principal: float, monthly_interest_rate: float, number_of_payments: int) -> float:    
-    return ( principal * monthly_interest_rate ) / ( 1 - (1 + monthly_interest_rate) ** (-number_of_payments) )
+from instrumentation import instrument
+from loan_comparison import loan_schedules, loans_to_arrays
+from loan_project import calculate_monthly_payment
 
 
+@instrument
 def calculate_loan_values(loan: dict[str, Any]):
     principal = loan['Principal']
     apr = loan['APR']
@@ -27,22 +28,13 @@ def calculate_loan_values(loan: dict[str, Any]):
 
     return loan_values
 
+@instrument
 def plot_graph(loans: list[dict[str, Any]]):
-    loan_values_list = []
-    max_length = 0
-
-    for loan in loans:
-        loan_values = calculate_loan_values(loan)
-        loan_values_list.append(loan_values)
-        max_length = max(max_length, len(loan_values))
-
-    padded_loan_values_list = [
-        np.pad(loan_values, (0, max_length - len(loan_values)), constant_values=0.0)
-        for loan_values in loan_values_list
-    ]
+    # every balance is worked out in one pass, already padded with zeros to the longest loan
+    balances = loan_schedules(*loans_to_arrays(loans))['remaining']
 
     plt.figure(figsize=(10, 6))
-    for i, loan_values in enumerate(padded_loan_values_list):
+    for i, loan_values in enumerate(balances):
         plt.plot(loan_values, label=f"Loan {i + 1}")
 
     plt.title("Loan Balance Over Time")
@@ -0,0 +1,111 @@
+'''
+Monte Carlo that stops once it has converged, rather than after a fixed number of trials.
+
+Trials are run in vectorised batches. After each batch the Wilson score interval
+of every outcome's probability is worked out, and the run stops once every
+interval's half-width is within the requested amount (or max_trials is reached).
+The total variation distance between successive estimates is recorded too, as a
+view of how much each batch still moves the answer.
+
+The intervals hold for all outcomes at once: with k outcomes each one is worked
+out at confidence 1 - (1 - confidence) / k (the Bonferroni correction), so at 95%
+every interval contains its probability together at least 95% of the time,
+rather than each one on its own.
+
+A 95% half-width of 1% over the 8 vertices of the cube needs about 15,000
+trials, under a sixth of the 100,000 the ant scripts use.
+'''
+
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Callable
+
+import numpy as np
+
+
+@dataclass
+class MonteCarloResult:
+    trials: int
+    counts: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    converged: bool
+    tv_distances: list[float] = field(default_factory=list)
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        return self.counts / self.trials
+
+    @property
+    def half_widths(self) -> np.ndarray:
+        return (self.upper - self.lower) / 2
+
+
+def z_score(confidence: float) -> float:
+    '''number of standard deviations either side of the mean that covers the given confidence'''
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def simultaneous_z_score(confidence: float, outcomes: int) -> float:
+    '''z score that makes the intervals of all the outcomes hold together at the given confidence'''
+    return z_score(1 - (1 - confidence) / outcomes)
+
+
+def wilson_interval(counts: np.ndarray, trials: int, z: float) -> tuple[np.ndarray, np.ndarray]:
+    '''Wilson score interval, which unlike p +- z * sqrt(p(1 - p) / n) doesn't collapse to zero width when a count is 0'''
+    p = counts / trials
+    denominator = 1 + z ** 2 / trials
+    centre = (p + z ** 2 / (2 * trials)) / denominator
+    spread = z * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    # at 0 or all of the trials the bounds are exactly 0 or 1, but rounding can move them slightly
+    lower = np.where(counts == 0, 0.0, np.maximum(centre - spread, 0.0))
+    upper = np.where(counts == trials, 1.0, np.minimum(centre + spread, 1.0))
+    return lower, upper
+
+
+def total_variation_distance(p: np.ndarray, q: np.ndarray) -> float:
+    return float(np.abs(p - q).sum() / 2)
+
+
+def run_until_converged(
+        simulate_batch: Callable[[int, np.random.Generator], np.ndarray],
+        half_width: float = 0.01,
+        confidence: float = 0.95,
+        batch_size: int = 1_000,
+        max_trials: int = 100_000,
+        rng: np.random.Generator | None = None,
+    ) -> MonteCarloResult:
+    '''
+    runs simulate_batch(batch_size, rng), which returns how many trials ended in each
+    outcome, until every outcome's probability is known to within half_width
+    '''
+    if max_trials < 1 or batch_size < 1:
+        raise ValueError(f'max_trials and batch_size must be at least 1, got {max_trials} and {batch_size}.')
+    rng = np.random.default_rng() if rng is None else rng
+
+    counts = simulate_batch(min(batch_size, max_trials), rng).astype(np.int64)
+    trials = int(counts.sum())
+    z = simultaneous_z_score(confidence, len(counts))
+    tv_distances: list[float] = []
+
+    while True:
+        lower, upper = wilson_interval(counts, trials, z)
+        converged = bool(((upper - lower) / 2 <= half_width).all())
+        if converged or trials >= max_trials:
+            return MonteCarloResult(trials, counts, lower, upper, converged, tv_distances)
+
+        previous = counts / trials
+        counts = counts + simulate_batch(min(batch_size, max_trials - trials), rng)
+        trials = int(counts.sum())
+        tv_distances.append(total_variation_distance(previous, counts / trials))
+
+
+def print_result(result: MonteCarloResult, exact: np.ndarray | None = None):
+    status = 'converged' if result.converged else 'stopped at the trial limit'
+    print (f'{result.trials} trials ({status})')
+
+    for vertex, (probability, lower, upper) in enumerate(zip(result.probabilities, result.lower, result.upper)):
+        line = f'p({vertex}): {probability:.2%} [{lower:.2%}, {upper:.2%}]'
+        if exact is not None:
+            line += f' exact {exact[vertex]:.2%}'
+        print (line)
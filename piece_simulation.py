@@ -0,0 +1,327 @@
+'''
+Generalises the rook simulation to bishops, queens and knights on N x N boards (up to 64 x 64).
+
+Squares are numbered square = (x - 1) * board_size + (y - 1) for the 1-based
+coordinates rook_simulation uses, and a set of squares is stored as a bitboard: a Python
+int with bit `square` set. For each piece and board size the squares attacked
+from every square are worked out once and cached, so checking a placement is
+just an AND and an OR per piece.
+
+As in rook_simulation, pieces challenge each other along a line even if another
+piece is in the way, so every attack relation here is symmetric.
+'''
+
+import math
+import random
+from functools import lru_cache
+from typing import Iterable
+
+import matplotlib.pyplot as plt
+
+from instrumentation import add_count, instrument
+
+BOARD_SIZE = 8 # the board is BOARD_SIZE x BOARD_SIZE unless a board_size is given
+MAX_BOARD_SIZE = 64
+# most work the exact search for knights and queens does before giving up, about a second.
+# a unit is roughly the time to combine 64 squares of bitboard, and each step of the
+# search costs 32 units of overhead plus one unit per 64 squares on the board
+EXACT_SEARCH_LIMIT = 130_000_000
+PIECES = ('rook', 'bishop', 'queen', 'knight')
+KNIGHT_MOVES = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+
+
+def to_square(x: int, y: int, board_size: int = BOARD_SIZE) -> int:
+    '''converts a 1-based coordinate into a square number'''
+    return (x - 1) * board_size + (y - 1)
+
+
+def check_board_size(board_size: int) -> None:
+    if not 1 <= board_size <= MAX_BOARD_SIZE:
+        raise ValueError(f'Board size must be between 1 and {MAX_BOARD_SIZE}, got {board_size}.')
+
+
+def check_piece_count(num_pieces: int, board_size: int) -> None:
+    if not 0 <= num_pieces <= board_size * board_size:
+        raise ValueError(f"Can't place {num_pieces} pieces on a {board_size} x {board_size} board.")
+
+
+@lru_cache(maxsize=None)
+def line_masks(board_size: int) -> tuple[list[int], list[int], list[int], list[int]]:
+    '''bitboards of every row, column, diagonal (x - y) and anti-diagonal (x + y)'''
+    rows = [0] * board_size
+    columns = [0] * board_size
+    diagonals = [0] * (2 * board_size - 1)
+    anti_diagonals = [0] * (2 * board_size - 1)
+
+    for x in range(board_size):
+        for y in range(board_size):
+            bit = 1 << (x * board_size + y)
+            rows[x] |= bit
+            columns[y] |= bit
+            diagonals[x - y + board_size - 1] |= bit
+            anti_diagonals[x + y] |= bit
+
+    return rows, columns, diagonals, anti_diagonals
+
+
+@lru_cache(maxsize=None)
+def attack_masks(piece: str, board_size: int = BOARD_SIZE) -> tuple[int, ...]:
+    '''returns a bitboard of the squares attacked from each square by the given piece'''
+    if piece not in PIECES:
+        raise ValueError(f"Unknown piece '{piece}', expected one of {', '.join(PIECES)}.")
+    check_board_size(board_size)
+
+    rows, columns, diagonals, anti_diagonals = line_masks(board_size)
+    masks = []
+    for x in range(board_size):
+        for y in range(board_size):
+            square_bit = 1 << (x * board_size + y)
+            mask = 0
+            if piece in ('rook', 'queen'):
+                mask |= rows[x] | columns[y]
+            if piece in ('bishop', 'queen'):
+                mask |= diagonals[x - y + board_size - 1] | anti_diagonals[x + y]
+            if piece == 'knight':
+                for dx, dy in KNIGHT_MOVES:
+                    if 0 <= x + dx < board_size and 0 <= y + dy < board_size:
+                        mask |= 1 << ((x + dx) * board_size + y + dy)
+            # a piece doesn't attack its own square
+            masks.append(mask & ~square_bit)
+
+    return tuple(masks)
+
+
+def check_if_challenge(piece: str, squares: Iterable[int], board_size: int = BOARD_SIZE) -> bool:
+    '''checks whether any two pieces on the given squares challenge each other'''
+    masks = attack_masks(piece, board_size)
+    occupied = 0
+    for square in squares:
+        bit = 1 << square
+        # attacks are symmetric, so it is enough to check each piece against the ones before it.
+        # two pieces on the same square also count as challenging each other
+        if (masks[square] | bit) & occupied:
+            return True
+        occupied |= bit
+    return False
+
+
+def allocate_random_squares(n: int, board_size: int = BOARD_SIZE) -> list[int]:
+    '''Allocates n unique squares'''
+    check_board_size(board_size)
+    check_piece_count(n, board_size)
+    number_of_squares = board_size * board_size
+
+    # a bitmask of the occupied squares makes sure every square is unique
+    occupied = 0
+    squares: list[int] = []
+    while len(squares) < n:
+        square = random.randrange(number_of_squares)
+        if not occupied >> square & 1:
+            occupied |= 1 << square
+            squares.append(square)
+
+    return squares
+
+
+@instrument
+def run_simulation(piece: str, num_pieces: int, num_simulations: int, board_size: int = BOARD_SIZE) -> int:
+    '''runs the simulation and returns the total challenges'''
+    masks = attack_masks(piece, board_size)
+    check_piece_count(num_pieces, board_size)
+    number_of_squares = board_size * board_size
+
+    challenge_count = 0
+    for _ in range(num_simulations):
+        # allocation and checking are done in one loop so a trial never builds a list
+        occupied = attacked = 0
+        placed = 0
+        while placed < num_pieces:
+            square = random.randrange(number_of_squares)
+            if occupied >> square & 1:
+                continue
+            occupied |= 1 << square
+            attacked |= masks[square]
+            placed += 1
+        # the placement has a challenge if some piece stands on a square another one attacks
+        challenge_count += int(bool(attacked & occupied))
+
+    add_count(run_simulation, 'trials', num_simulations)
+
+    return challenge_count
+
+
+def count_non_attacking_bishops(num_pieces: int, board_size: int) -> int:
+    '''
+    counts bishop placements with no challenges by dynamic programming over diagonals
+
+    every diagonal has squares of one colour and bishops on different colours never
+    meet, so each colour is counted on its own. Sorted by length, each diagonal crosses
+    all the anti-diagonals a shorter one of the same colour crosses, so placing a
+    bishop on a diagonal after j others leaves its length - j free squares.
+    '''
+    counts_by_colour = []
+    for colour in (0, 1):
+        lengths = sorted(
+            board_size - abs(d)
+            for d in range(-(board_size - 1), board_size)
+            if d % 2 == colour
+        )
+        # ways[j] is the number of ways to place j bishops on the diagonals so far
+        ways = [1] + [0] * num_pieces
+        for length in lengths:
+            for j in range(num_pieces, 0, -1):
+                ways[j] += ways[j - 1] * max(length - (j - 1), 0)
+        counts_by_colour.append(ways)
+
+    light, dark = counts_by_colour
+    return sum(light[j] * dark[num_pieces - j] for j in range(num_pieces + 1))
+
+
+def count_by_search(piece: str, num_pieces: int, board_size: int) -> int:
+    '''
+    counts placements with no challenges by depth first search in increasing square order
+
+    the last two pieces are counted directly rather than searched: one piece can go
+    on any available square, and two pieces on any available pair minus the pairs
+    that attack each other. The search gives up with ValueError after
+    EXACT_SEARCH_LIMIT work rather than running for hours.
+    '''
+    masks = attack_masks(piece, board_size)
+    step_cost = 32 + board_size * board_size // 64
+    work = 0
+
+    def take_step() -> None:
+        nonlocal work
+        work += step_cost
+        if work > EXACT_SEARCH_LIMIT:
+            raise ValueError(
+                f'Counting {num_pieces} {piece}s on a {board_size} x {board_size} board exactly is too big a search, '
+                'use the monte_carlo method instead.'
+            )
+
+    def count_pairs(available: int) -> int:
+        number_available = available.bit_count()
+        attacking_pairs = 0
+        while available:
+            take_step()
+            bit = available & -available
+            available ^= bit
+            attacking_pairs += (masks[bit.bit_length() - 1] & available).bit_count()
+        return number_available * (number_available - 1) // 2 - attacking_pairs
+
+    # the available bitboard already excludes attacked squares and squares before the last piece
+    def count(available: int, remaining: int) -> int:
+        if remaining == 1:
+            return available.bit_count()
+        if remaining == 2:
+            return count_pairs(available)
+        total = 0
+        while available:
+            take_step()
+            bit = available & -available
+            available ^= bit
+            total += count(available & ~masks[bit.bit_length() - 1], remaining - 1)
+        return total
+
+    return count((1 << (board_size * board_size)) - 1, num_pieces)
+
+
+def count_non_challenging_placements(piece: str, num_pieces: int, board_size: int = BOARD_SIZE) -> int:
+    '''counts the ways of placing num_pieces identical pieces so none challenge each other'''
+    attack_masks(piece, board_size) # checks the piece and board size
+    check_piece_count(num_pieces, board_size)
+
+    if num_pieces == 0:
+        return 1
+    if piece == 'rook':
+        # one rook per row and column: choose the rows, the columns, then match them up
+        if num_pieces > board_size:
+            return 0
+        return math.comb(board_size, num_pieces) ** 2 * math.factorial(num_pieces)
+    if piece == 'bishop':
+        return count_non_attacking_bishops(num_pieces, board_size)
+
+    return count_by_search(piece, num_pieces, board_size)
+
+
+@instrument
+def exact_probability(piece: str, num_pieces: int, board_size: int = BOARD_SIZE) -> float:
+    '''exact probability that a random placement has a challenge
+
+    rooks and bishops are counted with formulas that work on any board, knights and
+    queens by a search that raises ValueError once it gets beyond EXACT_SEARCH_LIMIT.
+    '''
+    check_piece_count(num_pieces, board_size)
+    number_of_squares = board_size * board_size
+    if num_pieces < 2:
+        return 0.0
+
+    if num_pieces == 2:
+        # every ordered pair of different squares is equally likely
+        attacking_pairs = sum(mask.bit_count() for mask in attack_masks(piece, board_size))
+        return attacking_pairs / (number_of_squares * (number_of_squares - 1))
+
+    total = math.comb(number_of_squares, num_pieces)
+    return 1 - count_non_challenging_placements(piece, num_pieces, board_size) / total
+
+
+def display_chessboard(piece: str, squares: list[int], board_size: int = BOARD_SIZE):
+    '''displays the chessboard with the pieces and the squares they attack'''
+    masks = attack_masks(piece, board_size)
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+
+    ax = plt.subplots(figsize=(6, 6))[1]
+
+    for x in range(board_size):
+        for y in range(board_size):
+            color = 'white' if (x + y) % 2 == 0 else 'gray'
+            ax.add_patch(plt.Rectangle((x, y), 1, 1, color=color))
+
+    for index, square in enumerate(squares):
+        color = colors[index % len(colors)]
+        for attacked in range(board_size * board_size):
+            if masks[square] >> attacked & 1:
+                ax.add_patch(plt.Rectangle((attacked // board_size, attacked % board_size), 1, 1, color=color, alpha=0.3))
+        ax.text(square // board_size + 0.5, square % board_size + 0.5, f'{piece[0].upper()}{index + 1}',
+                color='black', fontsize=12, ha='center', va='center')
+
+    # join up every pair of pieces that challenge each other
+    for index, square in enumerate(squares):
+        for other in squares[index + 1:]:
+            if masks[square] >> other & 1:
+                ax.plot([square // board_size + 0.5, other // board_size + 0.5],
+                        [square % board_size + 0.5, other % board_size + 0.5],
+                        color='black', linestyle='--', linewidth=1.5)
+
+    challenging = check_if_challenge(piece, squares, board_size)
+    status_text = "Challenging" if challenging else "Not Challenging"
+    ax.text(board_size / 2, -1, f"Status: {status_text}", fontsize=12, ha='center', va='center', color='black')
+
+    ax.set_xlim(0, board_size)
+    ax.set_ylim(-2, board_size)
+    ax.set_xticks(range(board_size))
+    ax.set_yticks(range(board_size))
+    ax.set_xticklabels(range(1, board_size + 1))
+    ax.set_yticklabels(range(1, board_size + 1))
+    ax.grid(False)
+
+    plt.gca().invert_yaxis()
+    plt.show()
+
+
+PIECE = 'queen'
+NUM_PIECES = 2
+NUM_SIMULATIONS = 10000
+
+def main():
+
+    display_chessboard(PIECE, allocate_random_squares(NUM_PIECES))
+
+    num_challenges = run_simulation(PIECE, NUM_PIECES, NUM_SIMULATIONS)
+
+    print (f'Percentage Challenge = {(num_challenges / NUM_SIMULATIONS):.2%}')
+    print (f'Exact Percentage Challenge = {exact_probability(PIECE, NUM_PIECES):.2%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -14,74 +14,194 @@ techniques and creates an engaging way to present findings.
 
 '''
 
+import threading
+import uuid
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable
+
 import numpy as np
 import plotly.graph_objects as go
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, no_update
+from flask import jsonify
+
+from instrumentation import add_count, instrument
+
+class Superseded(Exception):
+    '''raised inside a render when a newer request has arrived, so its result would never be shown'''
+
 
 # Function to generate random walk data
-def generate_random_walk(steps, walkers, bias, dimensions):
+@instrument
+def generate_random_walk(steps, walkers, bias, dimensions, is_stale: Callable[[], bool] = lambda: False):
     walks = []
     for _ in range(walkers):
         walk = np.zeros((steps, dimensions))
         for step in range(1, steps):
+            # a long walk is most of a render, so a superseded one stops part way through
+            if is_stale():
+                raise Superseded()
             step_direction = np.random.choice([-1, 1], size=dimensions, p=[1-bias, bias])
             walk[step] = walk[step - 1] + step_direction
         walks.append(walk)
     return walks
 
+
+# Dragging a slider sends one request per tick. Renders run on a small worker pool
+# and every request is tagged with a generation number: requests that are still
+# queued when a newer one from the same session arrives are cancelled, and a
+# running render checks is_stale() as it goes and gives up. Only the latest
+# slider state of each session is drawn, and sessions never cancel each other.
+class LatestOnlyRenderer:
+    def __init__(self, render: Callable[..., Any], max_workers: int = 2):
+        self.render_function = render
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render')
+        self.lock = threading.Lock()
+        # generations are numbered across all sessions, latest holds each session's newest
+        self.generation = 0
+        self.latest: dict[str, int] = {}
+        self.pending: dict[str, dict[int, Future]] = {}
+        self.dropped = 0
+        self.completed = 0
+
+    def render(self, session: str, *args: Any) -> Any:
+        '''renders args on the pool and returns the result, or dash.no_update if the session has sent a newer request'''
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.latest[session] = generation
+            pending = self.pending.setdefault(session, {})
+            # anything older from this session that hasn't started yet will never be shown, so don't start it
+            for future in pending.values():
+                future.cancel()
+            future = self.executor.submit(self._run, session, generation, args)
+            pending[generation] = future
+
+        try:
+            result = future.result()
+        except (CancelledError, Superseded):
+            result = no_update
+        finally:
+            with self.lock:
+                # a render that finished just after a newer request arrived would be
+                # replaced straight away, so it is dropped too
+                stale = self.is_stale(session, generation)
+                self._finish(session, generation)
+
+        with self.lock:
+            if stale:
+                self.dropped += 1
+            else:
+                self.completed += 1
+        if stale:
+            add_count(update_plot, 'dropped')
+            return no_update
+        return result
+
+    def _finish(self, session: str, generation: int) -> None:
+        # forget sessions with nothing left to render so closed tabs don't build up
+        pending = self.pending[session]
+        pending.pop(generation, None)
+        if not pending:
+            del self.pending[session]
+            del self.latest[session]
+
+    def is_stale(self, session: str, generation: int) -> bool:
+        return generation != self.latest.get(session)
+
+    def _run(self, session: str, generation: int, args: tuple[Any, ...]) -> Any:
+        if self.is_stale(session, generation):
+            raise Superseded()
+        return self.render_function(*args, is_stale=lambda: self.is_stale(session, generation))
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'generation': self.generation,
+                'sessions': len(self.pending),
+                'queue_depth': sum(len(pending) for pending in self.pending.values()),
+                'dropped': self.dropped,
+                'completed': self.completed,
+            }
+
+
+def build_figure(steps, bias, walkers, dimensions, is_stale: Callable[[], bool] = lambda: False) -> go.Figure:
+    fig = go.Figure()
+    for i in range(walkers):
+        # generating walkers one at a time uses the random numbers in the same order as all at once
+        walk = generate_random_walk(steps, 1, bias, dimensions, is_stale)[0]
+        if dimensions == 1:
+            fig.add_trace(go.Scatter(y=walk[:, 0], mode='lines', name=f'Walker {i+1}'))
+        elif dimensions == 2:
+            fig.add_trace(go.Scatter(x=walk[:, 0], y=walk[:, 1], mode='lines', name=f'Walker {i+1}'))
+        elif dimensions == 3:
+            fig.add_trace(go.Scatter3d(x=walk[:, 0], y=walk[:, 1], z=walk[:, 2], mode='lines', name=f'Walker {i+1}'))
+    fig.update_layout(title="Random Walk Simulation", showlegend=True)
+    return fig
+
+renderer = LatestOnlyRenderer(build_figure)
+
 # Initialize Dash app
 app = Dash(__name__)
 
+# queue depth and dropped request counts for the plot callback, over all sessions
+@app.server.route('/render-stats')
+def render_stats():
+    return jsonify(renderer.stats())
+
 STEP_SLIDER_MARKS = [10, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000]
 BIAS_SLIDER_MARKERS = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
 NUMBER_OF_WALKERS_SLIDER_MARKERS = list(range(1, 11, 1))
 DIMENSIONS_SLIDER_MARKERS = [1, 2, 3]
 
-# Layout with sliders for parameters
-app.layout = html.Div([
-    html.H1("Random Walk Simulation"),
-    dcc.Graph(id='random-walk-plot'),
-    html.Label(id='steps-label', children="Number of Steps:"),
-    dcc.Slider(
-        id='steps-slider', 
-        min=10, 
-        max=1000, 
-        step=10, 
-        value=100,
-        marks={i: str(i) for i in STEP_SLIDER_MARKS},
-        updatemode="drag"  # Update label while moving the slider
-    ),
-    html.Label(id='bias-label', children="Bias Probability:"),
-    dcc.Slider(
-        id='bias-slider', 
-        min=0.0, 
-        max=1.0, 
-        step=0.01, 
-        value=0.5,
-        marks={i: str(i) for i in BIAS_SLIDER_MARKERS},
-        updatemode="drag"  # Update label while moving the slider
-    ),
-    html.Label(id='walkers-label', children="Number of Walkers:"),
-    dcc.Slider(
-        id='walkers-slider', 
-        min=1, 
-        max=10, 
-        step=1, 
-        value=1,
-        marks={i: str(i) for i in NUMBER_OF_WALKERS_SLIDER_MARKERS},
-        updatemode="drag"  # Update label while moving the slider
-    ),
-    html.Label(id='dimensions-label', children="Dimensions:"),
-    dcc.Slider(
-        id='dimensions-slider', 
-        min=1, 
-        max=3, 
-        step=1, 
-        value=2,
-        marks={i: str(i) for i in DIMENSIONS_SLIDER_MARKERS},
-        updatemode="drag"  # Update label while moving the slider
-    )
-])
+# Layout with sliders for parameters, a function so every page load gets its own session id
+def serve_layout():
+    return html.Div([
+        html.H1("Random Walk Simulation"),
+        dcc.Store(id='session-id', data=uuid.uuid4().hex),
+        dcc.Graph(id='random-walk-plot'),
+        html.Label(id='steps-label', children="Number of Steps:"),
+        dcc.Slider(
+            id='steps-slider', 
+            min=10, 
+            max=1000, 
+            step=10, 
+            value=100,
+            marks={i: str(i) for i in STEP_SLIDER_MARKS},
+            updatemode="drag"  # Update label while moving the slider
+        ),
+        html.Label(id='bias-label', children="Bias Probability:"),
+        dcc.Slider(
+            id='bias-slider', 
+            min=0.0, 
+            max=1.0, 
+            step=0.01, 
+            value=0.5,
+            marks={i: str(i) for i in BIAS_SLIDER_MARKERS},
+            updatemode="drag"  # Update label while moving the slider
+        ),
+        html.Label(id='walkers-label', children="Number of Walkers:"),
+        dcc.Slider(
+            id='walkers-slider', 
+            min=1, 
+            max=10, 
+            step=1, 
+            value=1,
+            marks={i: str(i) for i in NUMBER_OF_WALKERS_SLIDER_MARKERS},
+            updatemode="drag"  # Update label while moving the slider
+        ),
+        html.Label(id='dimensions-label', children="Dimensions:"),
+        dcc.Slider(
+            id='dimensions-slider', 
+            min=1, 
+            max=3, 
+            step=1, 
+            value=2,
+            marks={i: str(i) for i in DIMENSIONS_SLIDER_MARKERS},
+            updatemode="drag"  # Update label while moving the slider
+        )
+    ])
+
+app.layout = serve_layout
 
 # Callback to update slider labels
 @app.callback(
@@ -119,20 +239,12 @@ def update_dimensions_label(value):
     Input('steps-slider', 'value'),
     Input('bias-slider', 'value'),
     Input('walkers-slider', 'value'),
-    Input('dimensions-slider', 'value')
+    Input('dimensions-slider', 'value'),
+    State('session-id', 'data')
 )
-def update_plot(steps, bias, walkers, dimensions):
-    walks = generate_random_walk(steps, walkers, bias, dimensions)
-    fig = go.Figure()
-    for i, walk in enumerate(walks):
-        if dimensions == 1:
-            fig.add_trace(go.Scatter(y=walk[:, 0], mode='lines', name=f'Walker {i+1}'))
-        elif dimensions == 2:
-            fig.add_trace(go.Scatter(x=walk[:, 0], y=walk[:, 1], mode='lines', name=f'Walker {i+1}'))
-        elif dimensions == 3:
-            fig.add_trace(go.Scatter3d(x=walk[:, 0], y=walk[:, 1], z=walk[:, 2], mode='lines', name=f'Walker {i+1}'))
-    fig.update_layout(title="Random Walk Simulation", showlegend=True)
-    return fig
+@instrument
+def update_plot(steps, bias, walkers, dimensions, session_id):
+    return renderer.render(session_id, steps, bias, walkers, dimensions)
 
 # Run the app
 if __name__ == '__main__':
@@ -1,9 +1,16 @@
 from dataclasses import dataclass
 import random
+from itertools import repeat
+from typing import Iterator
 
-import matplotlib.pyplot as plt
 import numpy as np
 
+import piece_simulation
+from instrumentation import instrument
+# rooks are one of the pieces in piece_simulation, so its attack tables do the checking.
+# the board is BOARD_SIZE x BOARD_SIZE and positions run from 1 to board_size
+from piece_simulation import BOARD_SIZE, allocate_random_squares, check_board_size, check_piece_count, display_chessboard, to_square
+
 # this dataclass allows for easy accessing of coordinates.
 # we can access Coordinate.x rather than doing coordinate[0] for easy readability
 @dataclass
@@ -11,99 +18,110 @@ class Coordinate:
     x: int
     y: int
 
-def check_if_two_challenge(rook1_coords: Coordinate, rook2_coords: Coordinate) -> bool:
-    '''checks if the xs or the ys are the same, if so they are challenging each other'''
-    return rook1_coords.x == rook2_coords.x or rook1_coords.y == rook2_coords.y
-
-def display_chessboard_with_rooks(rook1: Coordinate, rook2: Coordinate):
-    '''displays chessboard and challenging positions'''
+# Positions stores many coordinates as two int8 arrays (structure of arrays)
+# rather than a list of Coordinate objects, so a trial only needs two small arrays.
+class Positions:
+    __slots__ = ('xs', 'ys')
 
-    ax = plt.subplots(figsize=(6, 6))[1]
+    def __init__(self, xs: np.ndarray, ys: np.ndarray):
+        self.xs = np.asarray(xs, dtype=np.int8)
+        self.ys = np.asarray(ys, dtype=np.int8)
 
-    for x in range(8):
-        for y in range(8):
-            color = 'white' if (x + y) % 2 == 0 else 'gray'
-            ax.add_patch(plt.Rectangle((x, y), 1, 1, color=color))
+    @classmethod
+    def empty(cls, n: int) -> 'Positions':
+        return cls(np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.int8))
 
-    r1x, r1y = rook1.x - 1, rook1.y - 1
-    r2x, r2y = rook2.x - 1, rook2.y - 1
+    @classmethod
+    def from_coordinates(cls, coordinates: list[Coordinate]) -> 'Positions':
+        return cls([c.x for c in coordinates], [c.y for c in coordinates])
 
-    for i in range(8):
-        ax.add_patch(plt.Rectangle((i, r1y), 1, 1, color='red', alpha=0.3))
-        ax.add_patch(plt.Rectangle((r1x, i), 1, 1, color='red', alpha=0.3))
-        ax.add_patch(plt.Rectangle((i, r2y), 1, 1, color='blue', alpha=0.3))
-        ax.add_patch(plt.Rectangle((r2x, i), 1, 1, color='blue', alpha=0.3))
+    def __len__(self) -> int:
+        return len(self.xs)
 
-    ax.text(r1x + 0.5, r1y + 0.5, 'R1', color='black', fontsize=12, ha='center', va='center')
-    ax.text(r2x + 0.5, r2y + 0.5, 'R2', color='black', fontsize=12, ha='center', va='center')
+    def __getitem__(self, index: int) -> 'PositionView':
+        if not -len(self) <= index < len(self):
+            raise IndexError('position index out of range')
+        return PositionView(self, index % len(self))
 
-    challenging = check_if_two_challenge(rook1, rook2)
+    def __iter__(self):
+        return (PositionView(self, index) for index in range(len(self)))
 
-    if challenging:
-        ax.plot([r1x + 0.5, r2x + 0.5], [r1y + 0.5, r2y + 0.5], color='black', linestyle='--', linewidth=1.5)
+# a view of one position inside a Positions, it has .x and .y like a Coordinate
+# so it can be passed anywhere a Coordinate is expected without copying
+class PositionView:
+    __slots__ = ('positions', 'index')
 
-    status_text = "Challenging" if challenging else "Not Challenging"
-    ax.text(4, -1, f"Status: {status_text}", fontsize=12, ha='center', va='center', color='black')
+    def __init__(self, positions: Positions, index: int):
+        self.positions = positions
+        self.index = index
 
-    ax.set_xlim(0, 8)
-    ax.set_ylim(-2, 8)
-    ax.set_xticks(range(8))
-    ax.set_yticks(range(8))
-    ax.set_xticklabels(range(1, 9))
-    ax.set_yticklabels(range(1, 9))
-    ax.grid(False)
+    @property
+    def x(self) -> int:
+        return int(self.positions.xs[self.index])
 
-    plt.gca().invert_yaxis()
-    plt.show()
+    @property
+    def y(self) -> int:
+        return int(self.positions.ys[self.index])
 
+    def __repr__(self) -> str:
+        return f'PositionView(x={self.x}, y={self.y})'
 
+def to_board_square(x: int, y: int, board_size: int = BOARD_SIZE) -> int:
+    '''to_square for coordinates that might be off the board'''
+    if not (1 <= x <= board_size and 1 <= y <= board_size):
+        raise ValueError(f'Position ({x}, {y}) is off the {board_size} x {board_size} board.')
+    return to_square(x, y, board_size)
 
+def to_squares(rook_coords: list[Coordinate] | list[PositionView] | Positions, board_size: int = BOARD_SIZE) -> Iterator[int]:
+    '''converts coordinates into the square numbers used by piece_simulation, lazily so a trial doesn't build another list'''
+    if isinstance(rook_coords, Positions):
+        return map(to_board_square, rook_coords.xs.tolist(), rook_coords.ys.tolist(), repeat(board_size))
+    return map(to_board_square, [coords.x for coords in rook_coords], [coords.y for coords in rook_coords], repeat(board_size))
 
-def check_if_challenge(rook_coords: list[Coordinate]) -> bool:
-    '''This checks for challenges in a list of coordinates of arbitrary length. If any challenge is found, it will return True'''
-
-    max_index = len(rook_coords) - 1
-    index1, index2 = (0, 1)
-
-    while True:
-        if check_if_two_challenge(
-            rook_coords[index1],
-            rook_coords[index2]
-        ):
-            return True
-        
-        if index2 >= max_index:
-            index1 += 1
-            if index1 == index2: # there is no more coordinates to check
-                break
-            index2 = index1 + 1
+def check_if_two_challenge(rook1_coords: Coordinate | PositionView, rook2_coords: Coordinate | PositionView, board_size: int = BOARD_SIZE) -> bool:
+    '''checks if the xs or the ys are the same, if so they are challenging each other'''
+    return check_if_challenge([rook1_coords, rook2_coords], board_size)
 
-        else:
-            index2 += 1
+def display_chessboard_with_rooks(rook1: Coordinate | PositionView, rook2: Coordinate | PositionView, board_size: int = BOARD_SIZE):
+    '''displays chessboard and challenging positions'''
+    display_chessboard('rook', list(to_squares([rook1, rook2], board_size)), board_size)
 
-    return False
+def check_if_challenge(rook_coords: list[Coordinate] | Positions, board_size: int = BOARD_SIZE) -> bool:
+    '''This checks for challenges in a list of coordinates of arbitrary length. If any challenge is found, it will return True'''
+    return piece_simulation.check_if_challenge('rook', to_squares(rook_coords, board_size), board_size)
 
-def allocate_random_positions(n: int) -> list[Coordinate]:
+def allocate_random_positions(n: int, board_size: int = BOARD_SIZE) -> list[Coordinate]:
     '''Allocates n unique positions and returns the list of coordinates'''
-    positions: set[tuple[int, int]] = set()
-
-    while len(positions) < n:
-        positions.add((random.randint(1, 8), random.randint(1, 8)))
-
-    return [Coordinate(pos[0], pos[1]) for pos in positions]
-
-def run_simulation(num_rooks: int, num_simulations: int) -> int:
+    return [Coordinate(square // board_size + 1, square % board_size + 1) for square in allocate_random_squares(n, board_size)]
+
+def allocate_random_positions_compact(n: int, positions: Positions | None = None, board_size: int = BOARD_SIZE) -> Positions:
+    '''Allocates n unique positions, filling positions in place if given so its arrays can be reused between trials'''
+    # the int8 arrays only hold up to 127, MAX_BOARD_SIZE keeps well inside that
+    check_board_size(board_size)
+    check_piece_count(n, board_size)
+    if positions is None:
+        positions = Positions.empty(n)
+
+    # a bitmask of the occupied squares makes sure every position is unique
+    # without building a set or list each trial
+    occupied = 0
+    index = 0
+    while index < n:
+        square = random.randrange(board_size * board_size)
+        if occupied >> square & 1:
+            continue
+        occupied |= 1 << square
+        positions.xs[index] = square // board_size + 1
+        positions.ys[index] = square % board_size + 1
+        index += 1
+
+    return positions
+
+@instrument
+def run_simulation(num_rooks: int, num_simulations: int, board_size: int = BOARD_SIZE) -> int:
     '''runs the simulation and returns the total challenges'''
-    challenge_count = 0
-    for _ in range(num_simulations):
-        challenge_count += int(
-            check_if_challenge(
-                allocate_random_positions(num_rooks)
-            )
-        )
-
-    return challenge_count
-        
+    return piece_simulation.run_simulation('rook', num_rooks, num_simulations, board_size)
+
 NUM_ROOKS = 8
 NUM_SIMULATIONS = 10000
 
@@ -1,12 +1,17 @@
 from typing import Callable
 import math
 
+from instrumentation import counted, instrument
+
 
 def midpoint(a: float, b: float) -> float:
     return (a + b) / 2
 
+@instrument
 def simpsons_rule(f: Callable[[float], float], N: int, a: float, b: float) -> float:
 
+    f = counted(simpsons_rule, f)
+
     delta_x = (b - a) / N
     xs = list(map(
         lambda i: a + delta_x * i,
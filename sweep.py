@@ -0,0 +1,239 @@
+'''
+Parameter sweeps over any of the cli.py subcommands.
+
+A grid of parameter values is expanded into points, points that are not
+already cached are fanned out across a process pool, and every result is
+cached on disk keyed by (command, parameters, seed, code version). Extending
+a sweep therefore only computes the new points, and editing one of the
+modules a command depends on invalidates its cached results.
+
+Examples:
+    python sweep.py rooks --grid num_rooks=2:8 --grid num_simulations=10000 --seed 1
+    python sweep.py ant --grid steps=1:100 --grid max_iterations=10000 --seed 1 --format csv
+    python sweep.py walk --grid bias=0:1:0.1 --grid steps=100 --seed 1 --format parquet --output walk.parquet
+    python sweep.py apr --grid-file apr_grid.json --workers 4
+    python sweep.py pieces --grid piece=rook,queen --seed 1 --instrument metrics.prom
+'''
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator
+
+import instrumentation
+from cli import COMMANDS, Command, resolve_parameters, write_rows
+
+CACHE_DIR = Path(__file__).parent / '.sweep_cache'
+SOURCE_DIR = Path(__file__).parent
+
+
+def parse_number(text: str) -> int | float | str:
+    for number_type in (int, float):
+        try:
+            return number_type(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_values(text: str) -> list[Any]:
+    '''parses "a,b,c" into a list, or "start:stop[:step]" into an inclusive range'''
+    if ':' not in text:
+        return [parse_number(value) for value in text.split(',')]
+
+    parts = [parse_number(part) for part in text.split(':')]
+    if len(parts) > 3 or not all(isinstance(part, (int, float)) for part in parts):
+        raise ValueError(f"Ranges must be numbers written as start:stop[:step], got '{text}'.")
+    start, stop = parts[0], parts[1]
+    step = parts[2] if len(parts) > 2 else 1
+    if step == 0:
+        raise ValueError(f"The step of '{text}' can't be 0.")
+    if (stop - start) * step < 0:
+        raise ValueError(f"The step of '{text}' goes away from the stop value, use a {'negative' if step > 0 else 'positive'} step.")
+
+    # floor rather than round so the range never goes past stop, the small
+    # tolerance keeps stop itself when the step doesn't divide exactly in floating point
+    count = math.floor((stop - start) / step + 1e-9) + 1
+
+    if all(isinstance(part, int) for part in (start, stop, step)):
+        return [start + i * step for i in range(count)]
+    # rounding stops values like 0.30000000000000004 from appearing in the output
+    return [round(start + i * step, 12) for i in range(count)]
+
+
+def expand_grid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    '''turns {"a": [1, 2], "b": [3]} into [{"a": 1, "b": 3}, {"a": 2, "b": 3}]'''
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def code_version(command: Command) -> str:
+    '''hash of the source files a command's results depend on'''
+    digest = hashlib.sha256()
+    for module in ('cli', *command.modules):
+        digest.update((SOURCE_DIR / f'{module}.py').read_bytes().replace(b'\r\n', b'\n'))
+    return digest.hexdigest()[:16]
+
+
+def cache_path(cache_dir: Path, command: Command, params: dict[str, Any], version: str) -> Path:
+    key = json.dumps({
+        'command': command.name,
+        'parameters': params,
+        'seed': params.get('seed'),
+        'version': version,
+    }, sort_keys=True)
+    return cache_dir / command.name / f'{hashlib.sha256(key.encode()).hexdigest()}.json'
+
+
+def is_cacheable(params: dict[str, Any]) -> bool:
+    '''unseeded stochastic runs are not reproducible, so they are never cached'''
+    return 'seed' not in params or params['seed'] is not None
+
+
+def compute_point(command_name: str, params: dict[str, Any]) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    '''returns the rows of one point and the metrics recorded while computing them'''
+    # top level function so it can be sent to the worker processes
+    rows = list(COMMANDS[command_name].run(params))
+    if not instrumentation.is_enabled():
+        return rows, []
+    # reset so the next point on this worker only reports its own metrics
+    metrics = instrumentation.snapshot()
+    instrumentation.reset()
+    return rows, metrics
+
+
+def run_sweep(
+        command: Command,
+        points: list[dict[str, Any]],
+        workers: int | None = None,
+        cache_dir: Path | None = CACHE_DIR,
+    ) -> Iterator[dict[str, Any]]:
+    '''runs every point, reusing cached results, and yields rows in grid order
+
+    each point's rows are yielded as soon as it and the points before it are done,
+    so a long sweep writes as it goes and a failing point keeps the rows before it.
+    When instrumentation is enabled the workers record metrics too, and they are
+    merged into this process's metrics as the points finish.
+    '''
+    version = code_version(command)
+    cached: dict[int, list[dict[str, Any]]] = {}
+    to_compute: list[int] = []
+
+    for index, params in enumerate(points):
+        path = cache_path(cache_dir, command, params, version) if cache_dir is not None else None
+        if path is not None and is_cacheable(params) and path.exists():
+            cached[index] = json.loads(path.read_text())['rows']
+        else:
+            to_compute.append(index)
+
+    def in_grid_order(computed: Iterator[tuple[list[dict[str, Any]], list[dict[str, Any]]]]) -> Iterator[dict[str, Any]]:
+        for index, params in enumerate(points):
+            if index in cached:
+                rows = cached[index]
+            else:
+                # executor.map returns results in the order the points were given
+                rows, metrics = next(computed)
+                instrumentation.merge(metrics)
+                if cache_dir is not None and is_cacheable(params):
+                    write_cache_entry(cache_path(cache_dir, command, params, version), params, version, rows)
+            for row in rows:
+                yield {**params, **row}
+
+    if not to_compute:
+        yield from in_grid_order(iter(()))
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=instrumentation.init_worker,
+        initargs=(instrumentation.is_enabled(), instrumentation.is_tracking_memory()),
+    )
+    try:
+        yield from in_grid_order(executor.map(
+            compute_point,
+            itertools.repeat(command.name),
+            [points[index] for index in to_compute]
+        ))
+    finally:
+        # after a failing point, or if the output is closed early, don't start the rest
+        executor.shutdown(cancel_futures=True)
+
+
+def write_cache_entry(path: Path, params: dict[str, Any], version: str, rows: list[dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write then rename so an interrupted sweep never leaves a half written entry
+    temporary_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    temporary_path.write_text(json.dumps({'parameters': params, 'version': version, 'rows': rows}))
+    temporary_path.replace(path)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Sweep a grid of parameters for one of the cli.py subcommands.')
+    parser.add_argument('command', choices=list(COMMANDS))
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=VALUES',
+                        help='values as "a,b,c" or an inclusive range "start:stop[:step]", can be repeated')
+    parser.add_argument('--grid-file', help='.json file mapping parameter names to lists of values')
+    parser.add_argument('--seed', type=int, help='seed used for every point that does not set one in the grid')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--cache-dir', default=str(CACHE_DIR))
+    parser.add_argument('--no-cache', action='store_true', help='neither read nor write cached results')
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], default='jsonl')
+    parser.add_argument('--output', help='file to write to (default: stdout, not available for parquet)')
+    parser.add_argument('--instrument', metavar='FILE',
+                        help='record timings and counts in every worker, written as Prometheus text if FILE ends in .prom, otherwise JSON lines')
+    parser.add_argument('--instrument-memory', action='store_true', help='also record memory high-water marks (slower)')
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    command = COMMANDS[args.command]
+
+    grid: dict[str, list[Any]] = {}
+    if args.grid_file:
+        with open(args.grid_file) as file:
+            grid_file = json.load(file)
+        if not isinstance(grid_file, dict) or not all(isinstance(values, list) for values in grid_file.values()):
+            parser.error('--grid-file must hold a JSON object mapping parameter names to lists of values')
+        grid.update(grid_file)
+    for item in args.grid:
+        name, separator, values = item.partition('=')
+        if not separator:
+            parser.error(f"--grid expects NAME=VALUES, got '{item}'")
+        try:
+            grid[name] = parse_values(values)
+        except ValueError as error:
+            parser.error(str(error))
+
+    defaults = {parameter.name: parameter.default for parameter in command.parameters}
+    if 'seed' in defaults:
+        defaults['seed'] = args.seed
+    try:
+        points = [resolve_parameters(command, defaults, point) for point in expand_grid(grid)]
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.format == 'parquet' and args.output is None:
+        parser.error('--output is required for parquet')
+
+    if args.instrument:
+        instrumentation.enable(memory=args.instrument_memory)
+    try:
+        rows = run_sweep(command, points, args.workers, None if args.no_cache else Path(args.cache_dir))
+        write_rows(rows, args.format, args.output)
+    except ValueError as error:
+        # raised by a point, e.g. more pieces than squares, after the rows before it were written
+        parser.error(str(error))
+    finally:
+        if args.instrument:
+            instrumentation.export(args.instrument)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import json
+import math
+import time
+
+import pytest
+
+from cli import COMMANDS, compile_function, main, math_expression, resolve_parameters
+
+
+@pytest.mark.parametrize('expression', [
+    "__import__('os').system('echo hi')",
+    'open("/etc/passwd")',
+    '(1).__class__.__bases__',
+    'math.__dict__',
+    'math.sin.__self__',
+    'x.__class__',
+    'x()',
+    'x(1)',
+    '(lambda: 1)()',
+    '[x for x in (1, 2)]',
+    'x[0]',
+    'x if x else 1',
+    '"text"',
+    'True + x',
+    'math.sin(x=1)',
+    'x << 2',
+])
+def test_math_expression_rejects_anything_but_arithmetic(expression):
+    with pytest.raises(ValueError):
+        math_expression(expression)
+
+
+def test_math_expression_rejects_numbers_too_big_for_a_float():
+    with pytest.raises(ValueError):
+        math_expression('1' + '0' * 400)
+
+
+def test_compiled_functions_work():
+    f = compile_function('math.sin(x) + sqrt(x) ** 2 - 3 * x // 2 % 5')
+    assert f(4.0) == pytest.approx(math.sin(4.0) + 4.0 - 6.0 % 5)
+
+
+def test_huge_powers_overflow_rather_than_hang():
+    f = compile_function('9 ** 9 ** 9 ** 9 + x')
+    start = time.perf_counter()
+    with pytest.raises(OverflowError):
+        f(1.0)
+    assert time.perf_counter() - start < 1
+
+
+def test_integrate_reports_overflow_as_a_usage_error(capsys):
+    with pytest.raises(SystemExit):
+        main(['integrate', '--function', '9 ** 9 ** 9 ** 9'])
+    assert 'Could not integrate' in capsys.readouterr().err
+
+
+def test_choices_are_checked_for_flags(capsys):
+    with pytest.raises(SystemExit):
+        main(['apr', '--method', 'foo'])
+    assert "invalid choice: 'foo'" in capsys.readouterr().err
+
+
+def test_choices_are_checked_for_input_files(tmp_path, capsys):
+    input_file = tmp_path / 'params.jsonl'
+    input_file.write_text(json.dumps({'shape': 'sphere'}) + '\n')
+    with pytest.raises(SystemExit):
+        main(['ant', '--input', str(input_file)])
+    assert "Invalid shape 'sphere'" in capsys.readouterr().err
+
+
+def test_resolve_parameters_accepts_every_choice():
+    command = COMMANDS['pieces']
+    defaults = {parameter.name: parameter.default for parameter in command.parameters}
+    for piece in ('rook', 'bishop', 'queen', 'knight'):
+        assert resolve_parameters(command, defaults, {'piece': piece})['piece'] == piece
+    with pytest.raises(ValueError):
+        resolve_parameters(command, defaults, {'piece': 'king'})
+
+
+def test_ant_reports_whether_it_converged(capsys):
+    main(['ant', '--half-width', '0.001', '--max-iterations', '2000', '--seed', '1'])
+    capped = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    main(['ant', '--half-width', '0.01', '--seed', '1'])
+    converged = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert all(row['converged'] is False and row['trials'] == 2000 for row in capped)
+    assert all(row['converged'] is True and row['tv_distance'] is not None for row in converged)
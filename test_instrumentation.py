@@ -0,0 +1,87 @@
+import threading
+import tracemalloc
+
+import pytest
+
+import instrumentation
+from instrumentation import enabled, measure, snapshot
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    instrumentation.disable()
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_disable_leaves_tracemalloc_running_if_it_was_already_started():
+    tracemalloc.start()
+    try:
+        instrumentation.enable(memory=True)
+        instrumentation.disable()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_disable_stops_tracemalloc_it_started():
+    instrumentation.enable(memory=True)
+    assert tracemalloc.is_tracing()
+    instrumentation.disable()
+    assert not tracemalloc.is_tracing()
+
+
+def test_nested_enabled_restores_the_outer_settings():
+    with enabled(memory=True):
+        with enabled(memory=False):
+            assert not instrumentation.is_tracking_memory()
+        assert instrumentation.is_enabled()
+        assert instrumentation.is_tracking_memory()
+        assert tracemalloc.is_tracing()
+    assert not instrumentation.is_enabled()
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_is_only_reported_when_measured():
+    with enabled():
+        with measure('no_memory'):
+            pass
+    with enabled(memory=True):
+        with measure('with_memory'):
+            data = [0] * 10_000
+        del data
+    rows = {row['name']: row for row in snapshot()}
+    assert 'memory_peak_bytes' not in rows['no_memory']
+    assert rows['with_memory']['memory_peak_bytes'] >= 80_000
+
+
+def test_memory_is_only_measured_on_the_thread_that_turned_it_on():
+    def work():
+        with measure('other_thread'):
+            pass
+
+    with enabled(memory=True):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        with measure('this_thread'):
+            pass
+    rows = {row['name']: row for row in snapshot()}
+    assert rows['other_thread']['calls'] == 1
+    assert 'memory_peak_bytes' not in rows['other_thread']
+    assert 'memory_peak_bytes' in rows['this_thread']
+
+
+def test_merge_adds_up_worker_snapshots():
+    with enabled():
+        instrumentation.merge([
+            {'name': 'f', 'calls': 2, 'seconds_total': 1.0, 'seconds_max': 0.75, 'trials': 10},
+            {'name': 'f', 'calls': 1, 'seconds_total': 0.5, 'seconds_max': 0.5, 'trials': 5, 'memory_peak_bytes': 100},
+        ])
+    row, = snapshot()
+    assert row['calls'] == 3
+    assert row['seconds_max'] == 0.75
+    assert row['trials'] == 15
+    assert row['memory_peak_bytes'] == 100
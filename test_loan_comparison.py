@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from loan_comparison import cash_flows, compare_loans, loan_schedules, loans_to_arrays, random_loans
+from loan_project import get_repayments_dataframe
+
+loan_project_extension = pytest.importorskip('loan_project_extension', reason='loan_project_extension needs tkinter')
+
+
+def test_balances_match_calculate_loan_values():
+    loans = random_loans(200)
+    schedules = loan_schedules(*loans_to_arrays(loans))
+    for index, loan in enumerate(loans):
+        expected = loan_project_extension.calculate_loan_values(loan)
+        np.testing.assert_allclose(schedules['remaining'][index, :loan['Months']], expected, atol=1e-6)
+        assert (schedules['remaining'][index, loan['Months']:] == 0).all()
+
+
+def test_schedules_match_get_repayments_dataframe():
+    loans = random_loans(5, seed=1)
+    schedules = loan_schedules(*loans_to_arrays(loans))
+    for index, loan in enumerate(loans):
+        df = get_repayments_dataframe(loan['Principal'], loan['APR'] / 100 / 12, loan['Months'])
+        months = loan['Months']
+        np.testing.assert_allclose(schedules['interest_paid'][index, :months], df['interest_paid'], atol=1e-6)
+        np.testing.assert_allclose(schedules['principal_paid'][index, :months], df['principal_paid'], atol=1e-6)
+        np.testing.assert_allclose(schedules['payment'][index, :months], df['total_paid'], atol=1e-6)
+
+
+def test_compare_loans_summary():
+    loans = [{'Principal': 1000, 'APR': 10, 'Months': 3}, {'Principal': 500, 'APR': 0, 'Months': 2}]
+    comparison = compare_loans(loans)
+
+    assert comparison['total_paid'].tolist() == pytest.approx((comparison['monthly_payment'] * comparison['months']).tolist())
+    # at a 0% discount rate the cost in today's money is just the interest
+    assert comparison['npv'].tolist() == pytest.approx(comparison['total_interest'].tolist())
+    assert comparison['break_even_month'].tolist() == [3, 2]
+    assert comparison.loc[1, 'total_interest'] == 0
+
+
+def test_cash_flows_are_one_row_per_loan_and_month():
+    loans = [{'Principal': 1000, 'APR': 10, 'Months': 3}, {'Principal': 500, 'APR': 0, 'Months': 2}]
+    flows = cash_flows(loans)
+
+    assert flows[['loan', 'month']].values.tolist() == [[1, 1], [1, 2], [1, 3], [2, 1], [2, 2]]
+    assert flows['cash_flow'].tolist()[3:] == [250, 250]
+    assert flows['cumulative_cash_flow'].tolist()[3:] == [-250, 0]
+
+
+@pytest.mark.parametrize('loans', [[], [{'Principal': 1000, 'APR': 10, 'Months': 0}]])
+def test_loans_without_months_are_rejected(loans):
+    with pytest.raises(ValueError):
+        compare_loans(loans)
@@ -0,0 +1,59 @@
+import itertools
+import math
+
+import pytest
+
+from piece_simulation import (
+    PIECES,
+    check_if_challenge,
+    count_non_challenging_placements,
+    exact_probability,
+)
+
+
+def count_by_brute_force(piece: str, num_pieces: int, board_size: int) -> int:
+    '''tries every placement, only usable on tiny boards'''
+    return sum(
+        not check_if_challenge(piece, squares, board_size)
+        for squares in itertools.combinations(range(board_size * board_size), num_pieces)
+    )
+
+
+@pytest.mark.parametrize('piece', PIECES)
+def test_exact_counts_match_brute_force(piece):
+    for board_size in range(1, 6):
+        for num_pieces in range(0, 5):
+            if num_pieces > board_size * board_size:
+                continue
+            expected = count_by_brute_force(piece, num_pieces, board_size)
+            assert count_non_challenging_placements(piece, num_pieces, board_size) == expected, (board_size, num_pieces)
+
+
+def test_exact_counts_match_known_results():
+    # the eight queens puzzle has 92 solutions and 14 bishops fit on a chessboard in 256 ways
+    assert count_non_challenging_placements('queen', 8, 8) == 92
+    assert count_non_challenging_placements('bishop', 14, 8) == 256
+    assert count_non_challenging_placements('bishop', 15, 8) == 0
+    assert count_non_challenging_placements('rook', 8, 8) == math.factorial(8)
+
+
+def test_exact_probability_of_two_pieces_matches_the_counts():
+    for piece in PIECES:
+        total = math.comb(64, 2)
+        assert exact_probability(piece, 2) == pytest.approx(1 - count_non_challenging_placements(piece, 2, 8) / total)
+
+
+@pytest.mark.parametrize('num_pieces, board_size', [(-1, 8), (65, 8), (2, 0), (2, 65)])
+def test_impossible_placements_are_rejected(num_pieces, board_size):
+    with pytest.raises(ValueError):
+        exact_probability('queen', num_pieces, board_size)
+
+
+def test_too_big_a_search_gives_up():
+    with pytest.raises(ValueError, match='monte_carlo'):
+        exact_probability('knight', 6, 64)
+
+
+def test_pieces_on_the_same_square_challenge_each_other():
+    assert check_if_challenge('knight', [10, 10])
+    assert not check_if_challenge('knight', [0, 1])
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from dash import no_update
+
+from random_walk import LatestOnlyRenderer, Superseded, generate_random_walk
+
+
+def blocking_render(release: threading.Event):
+    '''a render that waits for release, giving up like build_figure once it is stale'''
+    def render(value, is_stale):
+        while not release.wait(0.001):
+            if is_stale():
+                raise Superseded()
+        return value
+    return render
+
+
+def start_request(renderer: LatestOnlyRenderer, results: dict, session: str, value) -> threading.Thread:
+    generation = renderer.generation
+    thread = threading.Thread(target=lambda: results.__setitem__(value, renderer.render(session, value)))
+    thread.start()
+    # wait for the request to be numbered so requests arrive in a known order
+    while renderer.generation == generation:
+        time.sleep(0.001)
+    return thread
+
+
+def test_quick_requests_only_render_the_latest():
+    release = threading.Event()
+    renderer = LatestOnlyRenderer(blocking_render(release), max_workers=1)
+    results = {}
+
+    threads = [start_request(renderer, results, 'session', value) for value in range(6)]
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == {0: no_update, 1: no_update, 2: no_update, 3: no_update, 4: no_update, 5: 5}
+    assert renderer.stats() == {'generation': 6, 'sessions': 0, 'queue_depth': 0, 'dropped': 5, 'completed': 1}
+
+
+def test_sessions_do_not_cancel_each_other():
+    release = threading.Event()
+    renderer = LatestOnlyRenderer(blocking_render(release), max_workers=2)
+    results = {}
+
+    threads = [start_request(renderer, results, session, session) for session in ('first', 'second')]
+    assert renderer.stats()['sessions'] == 2
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == {'first': 'first', 'second': 'second'}
+    assert renderer.stats()['dropped'] == 0
+
+
+def test_finished_sessions_are_forgotten():
+    release = threading.Event()
+    renderer = LatestOnlyRenderer(blocking_render(release), max_workers=2)
+    results = {}
+
+    threads = [start_request(renderer, results, session, value) for session, value in (('a', 1), ('a', 2), ('b', 3))]
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert renderer.pending == {}
+    assert renderer.latest == {}
+    # a later request from a forgotten session still renders
+    assert renderer.render('a', 4) == 4
+
+
+def test_stale_walks_stop_part_way_through():
+    steps_checked = 0
+
+    def is_stale():
+        nonlocal steps_checked
+        steps_checked += 1
+        return steps_checked > 10
+
+    with pytest.raises(Superseded):
+        generate_random_walk(1000, 1, 0.5, 2, is_stale)
+    assert steps_checked == 11
+
+
+def test_random_walk_shape():
+    np.random.seed(0)
+    walk, = generate_random_walk(50, 1, 0.5, 3)
+    assert walk.shape == (50, 3)
+    assert (np.abs(np.diff(walk, axis=0)) == 1).all()
@@ -0,0 +1,83 @@
+import random
+import tracemalloc
+from typing import Callable
+
+import pytest
+
+from rook_simulation import (
+    Coordinate,
+    Positions,
+    allocate_random_positions,
+    allocate_random_positions_compact,
+    check_if_challenge,
+    check_if_two_challenge,
+)
+
+
+def measure_allocation_per_trial(allocate: Callable[[int], list[Coordinate] | Positions], num_rooks: int, num_trials: int = 1000) -> float:
+    '''uses tracemalloc to find the average peak number of bytes allocated by one trial'''
+    total_bytes = 0
+    tracemalloc.start()
+    try:
+        for _ in range(num_trials):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            check_if_challenge(allocate(num_rooks))
+            total_bytes += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return total_bytes / num_trials
+
+
+def test_positions_allocate_less_per_trial_than_coordinates():
+    random.seed(0)
+    positions = Positions.empty(8)
+
+    coordinate_bytes = measure_allocation_per_trial(allocate_random_positions, 8)
+    compact_bytes = measure_allocation_per_trial(lambda n: allocate_random_positions_compact(n, positions), 8)
+
+    assert compact_bytes < coordinate_bytes / 2
+
+
+def test_positions_and_coordinates_agree_on_challenges():
+    random.seed(1)
+    for _ in range(1000):
+        positions = allocate_random_positions_compact(3)
+        coordinates = [Coordinate(view.x, view.y) for view in positions]
+        assert check_if_challenge(positions) == check_if_challenge(coordinates)
+
+
+def test_compact_positions_are_unique_and_on_the_board():
+    random.seed(2)
+    positions = allocate_random_positions_compact(64)
+    squares = {(view.x, view.y) for view in positions}
+    assert len(squares) == 64
+    assert all(1 <= x <= 8 and 1 <= y <= 8 for x, y in squares)
+
+
+def test_rooks_on_the_same_square_challenge_each_other():
+    assert check_if_two_challenge(Coordinate(3, 3), Coordinate(3, 3))
+    assert check_if_challenge([Coordinate(1, 1), Coordinate(1, 1)])
+    assert check_if_challenge(Positions.from_coordinates([Coordinate(2, 5), Coordinate(2, 5)]))
+
+
+def test_two_rooks_challenge_along_rows_and_columns_only():
+    assert check_if_two_challenge(Coordinate(1, 2), Coordinate(1, 7))
+    assert check_if_two_challenge(Coordinate(4, 8), Coordinate(6, 8))
+    assert not check_if_two_challenge(Coordinate(1, 2), Coordinate(2, 1))
+
+
+@pytest.mark.parametrize('coordinate', [Coordinate(9, 1), Coordinate(1, 9), Coordinate(0, 4), Coordinate(3, -1)])
+def test_positions_off_the_board_are_rejected(coordinate):
+    with pytest.raises(ValueError):
+        check_if_challenge([Coordinate(1, 1), coordinate])
+    with pytest.raises(ValueError):
+        check_if_two_challenge(coordinate, Coordinate(1, 1))
+
+
+def test_board_size_is_checked():
+    with pytest.raises(ValueError):
+        allocate_random_positions_compact(2, board_size=200)
+    with pytest.raises(ValueError):
+        allocate_random_positions(2, board_size=0)